@@ -0,0 +1,59 @@
+# 貪欲法（assign_rolls）の浮動小数のループ版と整数単位の版（assign_rolls_fast）を、材料ストックの行数を増やしながら比較する
+#   python benchmarks/greedy_scaling.py --sizes 100 1000 10000 --demands 20
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cutting_stock.greedy import assign_rolls, assign_rolls_fast  # noqa: E402
+
+
+def random_order(seed, num_rolls, num_demands):
+    rng = random.Random(seed)
+    # 幅はmm単位の整数（ループ版の浮動小数の引き算でも誤差が出ず、出力を厳密に比較できる）
+    demands = [{"width": float(rng.randint(5, 250)), "length": rng.randint(500, 50000) * num_rolls // 100}
+               for _ in range(num_demands)]
+    # 幅・巻長がばらばらな1本ずつのロール（集約が効かない最悪ケース）
+    stock = [{"width": float(rng.randint(600, 1300)), "length": rng.choice([100, 200, 300, 500]), "count": 1}
+             for _ in range(num_rolls)]
+    return demands, stock, 10.0, 2.0
+
+
+def same_results(a, b):
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if any(x[key] != y[key] for key in ("width", "length", "count", "cuts", "layout")):
+            return False
+        if abs(x["remain"] - y["remain"]) > 1e-6:
+            return False
+    return True
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--demands", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'rolls':>8} {'rows':>8} {'loop[s]':>9} {'fast[s]':>9} {'speedup':>8} {'same':<5}")
+    for size in args.sizes:
+        order = random_order(args.seed, size, args.demands)
+        base, loop_time = timed(assign_rolls, *order)
+        fast, fast_time = timed(assign_rolls_fast, *order)
+        print(f"{size:>8} {len(fast):>8} {loop_time:>9.3f} {fast_time:>9.3f} "
+              f"{loop_time / max(fast_time, 1e-9):>7.1f}x {'yes' if same_results(base, fast) else 'NO':<5}")
+
+
+if __name__ == "__main__":
+    main()
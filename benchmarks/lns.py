@@ -0,0 +1,54 @@
+# LNS が貪欲法の計画を改善することを、同じ評価（不足面積、端材＋過剰生産面積）で確かめる。
+# 改善しない注文が1つでもあれば終了コード1で終わる
+#   python benchmarks/lns.py [order.json ...] --time-limit 3 --backend CP-SAT
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cutting_stock.cli import read_order  # noqa: E402
+from cutting_stock.engine import solve  # noqa: E402
+from cutting_stock.stock import aggregate_stock  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from multistart import score  # noqa: E402
+from warm_start import random_order  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("orders", nargs="*")
+    parser.add_argument("--random", type=int, default=8, help="number of random orders when no file is given")
+    parser.add_argument("--demands", type=int, default=8, help="demands per random order")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--backend", default="CP-SAT")
+    parser.add_argument("--time-limit", type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    orders = [(path, read_order(path)) for path in args.orders] or \
+        [(f"random-{seed}", random_order(seed, num_demands=args.demands)) for seed in range(args.random)]
+    print(f"{'order':<16} {'method':<8} {'time[s]':>8} {'shortage':>12} {'waste':>12}")
+    failed = []
+    for name, order in orders:
+        instance = (order["demands"], aggregate_stock(order["stock"]), order["edge_loss"], order["blade_width"])
+        scores = {}
+        for method in ("greedy", "lns"):
+            start = time.perf_counter()
+            rolls = solve(*instance, engine="standard" if method == "greedy" else method, backend=args.backend,
+                          threads=args.threads, time_limit=args.time_limit)["rolls"]
+            elapsed = time.perf_counter() - start
+            scores[method] = score(rolls, order)
+            print(f"{name:<16} {method:<8} {elapsed:>8.2f} {scores[method][0]:>12.1f} {scores[method][1]:>12.1f}")
+        if not scores["lns"] < scores["greedy"]:
+            failed.append(name)
+    print(f"lns improved {len(orders) - len(failed)}/{len(orders)} orders")
+    if failed:
+        print("not improved: " + ", ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# 貪欲法・マルチスタート・最後のロールのMIP再配置を、同じ評価（不足面積、端材＋過剰生産面積）で比較する
+#   python benchmarks/multistart.py [order.json ...] --starts 64 --time-limit 10 --backend CP-SAT
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cutting_stock.backends import default_threads  # noqa: E402
+from cutting_stock.cli import read_order  # noqa: E402
+from cutting_stock.engine import solve  # noqa: E402
+from cutting_stock.multistart import DEFAULT_STARTS, multistart, plan_score  # noqa: E402
+from cutting_stock.units import WIDTH_SCALE, normalize_instance, normalize_rolls  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from warm_start import random_order  # noqa: E402
+
+
+def score(rolls, order):
+    demands, _, edge_loss, blade_width = normalize_instance(order["demands"], [], order["edge_loss"],
+                                                            order["blade_width"])
+    shortage, waste = plan_score(normalize_rolls(rolls), demands, edge_loss, blade_width)
+    # 面積は0.1mm×M単位なのでmm×Mに戻す
+    return shortage / WIDTH_SCALE, waste / WIDTH_SCALE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("orders", nargs="*")
+    parser.add_argument("--random", type=int, default=5, help="number of random orders when no file is given")
+    parser.add_argument("--starts", type=int, default=DEFAULT_STARTS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=default_threads())
+    parser.add_argument("--backend", default="CP-SAT")
+    parser.add_argument("--time-limit", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    orders = [(path, read_order(path)) for path in args.orders] or \
+        [(f"random-{seed}", random_order(seed, num_demands=8, num_classes=4)) for seed in range(args.random)]
+    print(f"{'order':<16} {'method':<12} {'time[s]':>8} {'shortage':>12} {'waste':>12}")
+    for name, order in orders:
+        instance = (order["demands"], order["stock"], order["edge_loss"], order["blade_width"])
+        runs = [
+            ("greedy", lambda: solve(*instance)["rolls"]),
+            ("multistart", lambda: multistart(*instance, args.starts, args.seed, args.workers, args.time_limit)),
+            ("greedy+MIP", lambda: solve(*instance, advanced=True, backend=args.backend, threads=args.workers,
+                                         time_limit=args.time_limit)["rolls"]),
+        ]
+        for method, run in runs:
+            start = time.perf_counter()
+            rolls = run()
+            elapsed = time.perf_counter() - start
+            shortage, waste = score(rolls, order)
+            print(f"{name:<16} {method:<12} {elapsed:>8.2f} {shortage:>12.1f} {waste:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
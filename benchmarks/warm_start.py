@@ -0,0 +1,70 @@
+# 貪欲解ヒントの有無で、最初の実行可能解までの時間と最終目的関数値を比較する
+#   python benchmarks/warm_start.py [order.json ...] --backends SCIP CP-SAT --time-limit 30
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cutting_stock.backends import FEASIBLE, OPTIMAL, default_threads  # noqa: E402
+from cutting_stock.cli import read_order  # noqa: E402
+from cutting_stock.greedy import assign_rolls  # noqa: E402
+from cutting_stock.optimize import solve_last_roll  # noqa: E402
+from cutting_stock.stock import aggregate_stock  # noqa: E402
+
+# 最初の実行可能解までの時間は、この時間制限の梯子で初めて解が得られた値で測る
+TIME_LADDER = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def random_order(seed, num_demands=6, num_classes=3):
+    rng = random.Random(seed)
+    demands = [{"width": float(rng.choice([35, 50, 80, 95, 120, 140, 230])), "length": rng.randint(500, 8000)}
+               for _ in range(num_demands)]
+    stock = [{"width": float(rng.choice([800, 1000, 1250])), "length": rng.choice([100, 200, 500]),
+              "count": rng.randint(5, 200)} for _ in range(num_classes)]
+    return {"demands": demands, "stock": aggregate_stock(stock), "edge_loss": 10.0, "blade_width": 2.0}
+
+
+def time_to_first_feasible(base, order, backend, formulation, threads, warm_start, time_limit):
+    for limit in TIME_LADDER:
+        if limit > time_limit:
+            break
+        _, report = solve_last_roll(base, order["edge_loss"], order["blade_width"], order["demands"],
+                                    formulation, backend, threads, limit, warm_start)
+        if report and report["status"] in (OPTIMAL, FEASIBLE):
+            return report["wall_time"]
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("orders", nargs="*")
+    parser.add_argument("--random", type=int, default=3, help="number of random orders when no file is given")
+    parser.add_argument("--backends", nargs="+", default=["SCIP", "CP-SAT"])
+    parser.add_argument("--formulation", default="compact")
+    parser.add_argument("--threads", type=int, default=default_threads())
+    parser.add_argument("--time-limit", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    orders = [(path, read_order(path)) for path in args.orders] or \
+        [(f"random-{seed}", random_order(seed)) for seed in range(args.random)]
+    print(f"{'order':<16} {'backend':<8} {'hint':<5} {'first feasible[s]':>18} {'final objective':>16} {'status':<10}")
+    for name, order in orders:
+        base = assign_rolls(order["demands"], order["stock"], order["edge_loss"], order["blade_width"])
+        for backend in args.backends:
+            for warm_start in (False, True):
+                first = time_to_first_feasible(base, order, backend, args.formulation, args.threads,
+                                               warm_start, args.time_limit)
+                _, report = solve_last_roll(base, order["edge_loss"], order["blade_width"], order["demands"],
+                                            args.formulation, backend, args.threads, args.time_limit, warm_start)
+                if report is None:
+                    print(f"{name:<16} {backend:<8} {'-':<5} {'(nothing to optimize)':>18}")
+                    continue
+                objective = "-" if report["objective"] is None else f"{report['objective']:.1f}"
+                print(f"{name:<16} {backend:<8} {'on' if warm_start else 'off':<5} "
+                      f"{'-' if first is None else f'{first:.2f}':>18} {objective:>16} {report['status']:<10}")
+
+
+if __name__ == "__main__":
+    main()
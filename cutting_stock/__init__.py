@@ -0,0 +1,5 @@
+from .cache import SolveCache, canonical_key
+from .colgen import column_generation
+from .stock import aggregate_stock
+
+__all__ = ["SolveCache", "aggregate_stock", "canonical_key", "column_generation"]
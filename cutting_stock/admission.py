@@ -0,0 +1,50 @@
+import os
+import threading
+
+from .backends import default_threads
+
+# プロセス全体で同時に使うソルバーのスレッド数の上限（未設定ならコア数）
+MAX_THREADS_ENV = "CUTTING_STOCK_MAX_THREADS"
+
+
+class ThreadAdmission:
+    # 同じプロセスで動くジョブ（Streamlitでは全セッション）のソルバーのスレッド数の合計を上限までに抑える。
+    # 入れないジョブは到着順に待たせる。先頭が入れるまで後ろも待つので、スレッド数の多いジョブも後回しにならない
+    def __init__(self, capacity=None):
+        self.capacity = capacity or default_threads()
+        self.in_use = 0
+        self._waiting = []
+        self._cond = threading.Condition()
+
+    def acquire(self, ticket, threads, cancelled=lambda: False, poll=0.2):
+        # 戻り値: 予約したスレッド数（上限で切り詰める）。待っている間にキャンセルされたら 0
+        threads = max(1, min(threads, self.capacity))
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                while self._waiting[0] is not ticket or self.in_use + threads > self.capacity:
+                    if cancelled():
+                        return 0
+                    self._cond.wait(poll)
+                self.in_use += threads
+                return threads
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self, threads):
+        with self._cond:
+            self.in_use -= threads
+            self._cond.notify_all()
+
+    def position(self, ticket):
+        # 待ち行列での順番（1始まり）。待っていなければ 0
+        with self._cond:
+            return self._waiting.index(ticket) + 1 if ticket in self._waiting else 0
+
+    def stats(self):
+        with self._cond:
+            return {"capacity": self.capacity, "in_use": self.in_use, "waiting": len(self._waiting)}
+
+
+ADMISSION = ThreadAdmission(int(os.environ.get(MAX_THREADS_ENV, 0)) or None)
@@ -0,0 +1,205 @@
+import os
+import time
+
+try:
+    from ortools.linear_solver import linear_solver_pb2, pywraplp
+    from ortools.sat.python import cp_model
+    ORTOOLS_AVAILABLE = True
+except ImportError:
+    ORTOOLS_AVAILABLE = False
+
+BACKENDS = ("SCIP", "CP-SAT", "CBC")
+OPTIMAL = "OPTIMAL"
+FEASIBLE = "FEASIBLE"
+INFEASIBLE = "INFEASIBLE"
+NOT_SOLVED = "NOT_SOLVED"
+UNAVAILABLE = "UNAVAILABLE"
+
+
+# 1回の求解が既定で使うコアの割合（同時に解く他の画面・ジョブのために、マシン全体は使わない）
+DEFAULT_THREAD_SHARE = 0.25
+# 1スレッドで解くバックエンド（SCIPの並列モードは pywraplp 経由だとルートノードの後で止まり、CBCはスレッド数を無視する）
+SINGLE_THREADED = ("SCIP", "CBC")
+
+
+def default_threads():
+    # マシンのコア数
+    return os.cpu_count() or 1
+
+
+def solver_threads(backend=None):
+    # 1回の求解の既定スレッド数
+    if backend in SINGLE_THREADED:
+        return 1
+    return max(1, int(default_threads() * DEFAULT_THREAD_SHARE))
+
+
+# これ以下の相対ギャップは最適性の証明とみなす
+GAP_TOLERANCE = 1e-6
+
+
+def _gap(objective, bound):
+    if objective is None or bound is None:
+        return None
+    return abs(bound - objective) / max(abs(objective), 1e-9)
+
+
+def _report(name, status, wall_time, threads, objective, bound, relative_gap):
+    # ギャップの許容で止まった場合もソルバーは最適と返すので、ギャップが閉じていなければ FEASIBLE にする
+    gap = _gap(objective, bound)
+    if status == OPTIMAL and relative_gap and gap is not None and gap > GAP_TOLERANCE:
+        status = FEASIBLE
+    return {"backend": name, "status": status, "wall_time": wall_time, "threads": threads,
+            "objective": objective, "bound": bound, "gap": gap, "gap_limit": relative_gap}
+
+
+class LinearSolverBackend:
+    # pywraplp（SCIP / CBC）
+    integer_only = False
+
+    def __init__(self, name, threads=None):
+        # threads は受け付けるが常に1スレッドで解く（SINGLE_THREADED を参照）
+        self.name = name
+        self.threads = 1
+        self.solver = pywraplp.Solver.CreateSolver(name)
+
+    @property
+    def available(self):
+        return self.solver is not None
+
+    def IntVar(self, lb, ub, name):
+        return self.solver.IntVar(lb, ub, name)
+
+    def Add(self, constraint):
+        return self.solver.Add(constraint)
+
+    def Sum(self, terms):
+        return self.solver.Sum(terms)
+
+    def Maximize(self, expr):
+        self.solver.Maximize(expr)
+
+    def set_hint(self, values):
+        self.solver.SetHint([var for var, _ in values], [float(v) for _, v in values])
+
+    def value(self, var):
+        return var.solution_value()
+
+    def model_size(self):
+        proto = linear_solver_pb2.MPModelProto()
+        self.solver.ExportModelToProto(proto)
+        return {"variables": self.solver.NumVariables(), "constraints": self.solver.NumConstraints(),
+                "nonzeros": sum(len(c.var_index) for c in proto.constraint)}
+
+    def interrupt(self):
+        # 別スレッドから呼ぶ。SCIPはその時点の暫定解で終了する（CBCは非対応）
+        return self.solver.InterruptSolve()
+
+    def solve(self, time_limit, on_incumbent=None, relative_gap=None):
+        # pywraplpには改善解のコールバックがないため on_incumbent は使わない（途中の解は interrupt() で取り出す）。
+        # relative_gap: 相対ギャップがこれ以下になったら時間制限の前でも止める
+        self.solver.SetNumThreads(self.threads)
+        self.solver.SetTimeLimit(int(time_limit * 1000))
+        params = pywraplp.MPSolverParameters()
+        if relative_gap:
+            params.SetDoubleParam(pywraplp.MPSolverParameters.RELATIVE_MIP_GAP, relative_gap)
+        start = time.perf_counter()
+        status = self.solver.Solve(params)
+        wall_time = time.perf_counter() - start
+        if status == pywraplp.Solver.OPTIMAL:
+            status = OPTIMAL
+        elif status == pywraplp.Solver.FEASIBLE:
+            status = FEASIBLE
+        elif status == pywraplp.Solver.INFEASIBLE:
+            status = INFEASIBLE
+        else:
+            status = NOT_SOLVED
+        objective = bound = None
+        if status in (OPTIMAL, FEASIBLE):
+            objective = self.solver.Objective().Value()
+            bound = self.solver.Objective().BestBound()
+        return _report(self.name, status, wall_time, self.threads, objective, bound, relative_gap)
+
+
+class CpSatBackend:
+    # CP-SAT（全変数・係数が整数、マルチワーカーで並列探索）
+    integer_only = True
+
+    def __init__(self, threads=None):
+        self.name = "CP-SAT"
+        self.threads = threads or solver_threads(self.name)
+        self.model = cp_model.CpModel()
+        self.solver = cp_model.CpSolver()
+
+    @property
+    def available(self):
+        return True
+
+    def IntVar(self, lb, ub, name):
+        return self.model.NewIntVar(int(lb), int(ub), name)
+
+    def Add(self, constraint):
+        return self.model.Add(constraint)
+
+    def Sum(self, terms):
+        return cp_model.LinearExpr.Sum(list(terms))
+
+    def Maximize(self, expr):
+        self.model.Maximize(expr)
+
+    def set_hint(self, values):
+        for var, v in values:
+            self.model.AddHint(var, int(v))
+
+    def value(self, var):
+        return self.solver.Value(var)
+
+    def model_size(self):
+        proto = self.model.Proto()
+        return {"variables": len(proto.variables), "constraints": len(proto.constraints),
+                "nonzeros": sum(len(c.linear.vars) for c in proto.constraints)}
+
+    def interrupt(self):
+        # 別スレッドから呼ぶ。探索を止め、それまでの最良解を返す
+        self.solver.StopSearch()
+        return True
+
+    def solve(self, time_limit, on_incumbent=None, relative_gap=None):
+        self.solver.parameters.max_time_in_seconds = time_limit
+        self.solver.parameters.num_workers = self.threads
+        if relative_gap:
+            self.solver.parameters.relative_gap_limit = relative_gap
+        callback = _IncumbentCallback(on_incumbent) if on_incumbent else None
+        start = time.perf_counter()
+        status = self.solver.Solve(self.model, callback)
+        wall_time = time.perf_counter() - start
+        status = {
+            cp_model.OPTIMAL: OPTIMAL,
+            cp_model.FEASIBLE: FEASIBLE,
+            cp_model.INFEASIBLE: INFEASIBLE,
+        }.get(status, NOT_SOLVED)
+        objective = bound = None
+        if status in (OPTIMAL, FEASIBLE):
+            objective = self.solver.ObjectiveValue()
+            bound = self.solver.BestObjectiveBound()
+        return _report(self.name, status, wall_time, self.threads, objective, bound, relative_gap)
+
+
+if ORTOOLS_AVAILABLE:
+    class _IncumbentCallback(cp_model.CpSolverSolutionCallback):
+        # CP-SATが改善解を見つけるたびに (目的関数値, 上界, 変数の値を返す関数) を通知する。
+        # 値の関数はコールバックの中でだけ有効
+        def __init__(self, on_incumbent):
+            super().__init__()
+            self.on_incumbent = on_incumbent
+
+        def on_solution_callback(self):
+            self.on_incumbent(self.ObjectiveValue(), self.BestObjectiveBound(), self.Value)
+
+
+def create_backend(name, threads=None):
+    if name == "CP-SAT":
+        return CpSatBackend(threads)
+    if name in ("SCIP", "CBC"):
+        return LinearSolverBackend(name, threads)
+    raise ValueError(f"unknown backend: {name}")
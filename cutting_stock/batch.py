@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .engine import SHORTAGE, solve
+from .optimize import DEFAULT_TIME_LIMIT
+from .stock import aggregate_stock
+
+ROLL_COLUMNS = ["width", "length", "count", "cuts", "layout", "remain"]
+SUMMARY_COLUMNS = ["order", "status", "rolls_used", "rolls_lower_bound", "trim_area", "solver", "solver_status", "gap", "wall_time",
+                   "messages", "output"]
+
+
+def parse_order(order):
+    # {"demands": [{"width", "length"}], "stock": [{"width", "length", "count"}], "edge_loss", "blade_width"}
+    return {
+        "demands": [{"width": float(d["width"]), "length": d["length"]} for d in order["demands"]],
+        "stock": aggregate_stock(order["stock"]),
+        "edge_loss": float(order.get("edge_loss") or 0.0),
+        "blade_width": float(order.get("blade_width") or 0.0),
+    }
+
+
+def read_order(path):
+    with open(path, encoding="utf-8") as f:
+        return parse_order(json.load(f))
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def read_order_csv(path):
+    # 1行 = 需要または材料1件: order,kind(demand|stock),width,length,count[,edge_loss,blade_width]
+    orders = {}
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            order = orders.setdefault(row["order"], {"demands": [], "stock": [], "edge_loss": None,
+                                                     "blade_width": None})
+            item = {"width": float(row["width"]), "length": _number(row["length"])}
+            if row["kind"] == "demand":
+                order["demands"].append(item)
+            elif row["kind"] == "stock":
+                order["stock"].append(dict(item, count=int(row.get("count") or 1)))
+            else:
+                raise ValueError(f"{path}: unknown kind {row['kind']!r} in order {row['order']}")
+            for key in ("edge_loss", "blade_width"):
+                if row.get(key) and order[key] is None:
+                    order[key] = float(row[key])
+    return [(name, parse_order(order)) for name, order in orders.items()]
+
+
+def collect_orders(inputs):
+    # ディレクトリ（*.json / *.csv）、注文JSON、複数注文のCSVを (名前, 注文) のリストにする
+    orders = []
+    for item in map(Path, inputs):
+        files = sorted(p for p in item.iterdir() if p.suffix in (".json", ".csv")) if item.is_dir() else [item]
+        for path in files:
+            if path.suffix == ".csv":
+                orders.extend(read_order_csv(path))
+            else:
+                orders.append((path.stem, read_order(path)))
+    names = [name for name, _ in orders]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate order names: {', '.join(duplicates)}")
+    return orders
+
+
+def _solve_job(name, order, options):
+    # ワーカープロセス内で実行（ソルバーはジョブごとに生成される）
+    start = time.perf_counter()
+    try:
+        result = solve(order["demands"], order["stock"], order["edge_loss"], order["blade_width"], **options)
+        error = None
+    except Exception as e:
+        result = None
+        error = str(e)
+    return {"order": name, "result": result, "error": error, "wall_time": time.perf_counter() - start}
+
+
+def write_rolls(path, rolls):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, ROLL_COLUMNS)
+        writer.writeheader()
+        for r in rolls:
+            writer.writerow(dict(r, layout=" ".join(f"{w:g}" for w in r["layout"])))
+
+
+def summarize(job, output):
+    row = {"order": job["order"], "wall_time": f"{job['wall_time']:.2f}", "output": output}
+    if job["error"] is not None:
+        return dict(row, status="ERROR", messages=job["error"])
+    result = job["result"]
+    used = [r for r in result["rolls"] if r["layout"]]
+    report = result["report"] or {}
+    check = result.get("preflight") or {}
+    return dict(
+        row,
+        status="SHORTAGE" if SHORTAGE in result["messages"] else "OK",
+        rolls_used=sum(r["count"] for r in used),
+        rolls_lower_bound="" if check.get("rolls_lower_bound") is None else check["rolls_lower_bound"],
+        trim_area=f"{sum(r['remain'] * r['length'] * r['count'] for r in used):.1f}",
+        solver=report.get("backend", ""),
+        solver_status=report.get("status", ""),
+        gap="" if report.get("gap") is None else f"{report['gap'] * 100:.2f}%",
+        messages=" ".join(result["messages"]),
+    )
+
+
+def solve_batch(orders, out_dir, workers=None, time_limit=DEFAULT_TIME_LIMIT, threads=1, on_done=None, **options):
+    # 注文ごとに <out_dir>/<名前>.csv を書き、最後に summary.csv をまとめる。
+    # 既定では1ジョブ1スレッドにして、ワーカー数 = コア数でほぼ線形に伸びるようにする
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    options = dict(options, time_limit=time_limit, threads=threads)
+    summary = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_solve_job, name, order, options) for name, order in orders]
+        for future in futures:
+            job = future.result()
+            output = ""
+            if job["result"] is not None:
+                output = out_dir / f"{job['order']}.csv"
+                write_rolls(output, job["result"]["rolls"])
+                output = output.name
+            row = summarize(job, output)
+            summary.append(row)
+            if on_done:
+                on_done(row)
+    with open(out_dir / "summary.csv", "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(summary)
+    return summary
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .stock import aggregate_stock
+from .units import to_units
+
+# エンジンの出力が変わる変更を入れたら上げる（古いキャッシュを無効化するため）
+ENGINE_VERSION = "6"
+DEFAULT_MAXSIZE = 128
+
+
+def canonical_key(demands, stock, edge_loss, blade_width, engine, **options):
+    # 行の並び順や同一ロールの分割入力に左右されないキー（幅は0.1mm単位の整数）
+    payload = {
+        "demands": sorted([to_units(d["width"]), float(d["length"])] for d in demands),
+        "stock": [[to_units(s["width"]), float(s["length"]), int(s["count"])] for s in aggregate_stock(stock)],
+        "edge_loss": to_units(edge_loss),
+        "blade_width": to_units(blade_width),
+        "engine": engine,
+        "version": ENGINE_VERSION,
+        "options": options,
+    }
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SolveCache:
+    # メモリ上のLRU + 任意のSQLite（再起動後も残る）の2段キャッシュ
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            self._execute("CREATE TABLE IF NOT EXISTS solve_cache (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+
+    def _execute(self, sql, params=()):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(self._memory[key])
+        if self.path:
+            row = self._execute("SELECT value FROM solve_cache WHERE key = ?", (key,))
+            if row:
+                with self._lock:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                return json.loads(row[0])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        text = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, text)
+        if self.path:
+            self._execute("INSERT OR REPLACE INTO solve_cache (key, value, created) VALUES (?, ?, ?)",
+                          (key, text, time.time()))
+
+    def cached(self, key, compute, store=None):
+        # 戻り値: (値, キャッシュヒットか)。store(value) が False の結果は保存しない
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        if store is None or store(value):
+            self.put(key, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if self.path:
+            self._execute("DELETE FROM solve_cache")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "size": len(self._memory),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,154 @@
+import argparse
+import json
+import sys
+import time
+
+from .backends import BACKENDS, default_threads
+from .batch import collect_orders, read_order, solve_batch
+from .engine import ENGINES, solve
+from .jobs import SolveJob
+from .greedy import assign_rolls_fast as assign_rolls
+from .model import FORMULATIONS
+from .optimize import DEFAULT_RELATIVE_GAP, DEFAULT_TIME_LIMIT, solve_last_roll, solve_last_roll_dp
+
+# compare で MIPのバックエンドと並べられる動的計画法（小さな問題のみ）
+EXACT = "DP"
+
+
+def _format(value, pattern):
+    return "-" if value is None else pattern.format(value)
+
+
+def _print_event(event):
+    print(json.dumps(event, ensure_ascii=False), file=sys.stderr, flush=True)
+
+
+def _solve_streaming(*args, **kwargs):
+    # 暫定解を1行1件のJSONで標準エラーに流す。Ctrl+C でその時点の最良解を結果にする
+    job = SolveJob(*args, on_event=_print_event, **kwargs)
+    try:
+        while not job.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        job.cancel()
+        job.wait()
+    if job.error:
+        raise RuntimeError(job.error)
+    return job.result
+
+
+def solve_order(args):
+    order = read_order(args.input)
+    run = _solve_streaming if args.progress else solve
+    result = run(order["demands"], order["stock"], order["edge_loss"], order["blade_width"], args.engine,
+                 args.advanced, args.formulation, args.backend, args.threads, not args.no_warm_start,
+                 args.time_limit, seed=args.seed, relative_gap=args.gap, profile=args.profile)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+def batch_solve(args):
+    orders = collect_orders(args.inputs)
+    print(f"{'order':<20} {'status':<9} {'rolls':>6} {'trim':>12} {'solver':<12} {'gap':>8} {'time[s]':>8}")
+
+    def report(row):
+        print(f"{row['order']:<20} {row['status']:<9} {row.get('rolls_used', '-'):>6} {row.get('trim_area', '-'):>12} "
+              f"{row.get('solver_status') or '-':<12} {row.get('gap') or '-':>8} {row['wall_time']:>8}")
+
+    start = time.perf_counter()
+    summary = solve_batch(orders, args.out, args.workers, args.time_limit, args.threads, report,
+                          engine=args.engine, advanced=args.advanced, formulation=args.formulation,
+                          backend=args.backend, warm_start=not args.no_warm_start, seed=args.seed,
+                          relative_gap=args.gap)
+    print(f"{len(summary)} orders in {time.perf_counter() - start:.1f}s -> {args.out}")
+    return 1 if any(row["status"] == "ERROR" for row in summary) else 0
+
+
+def compare_backends(args):
+    order = read_order(args.input)
+    base = assign_rolls(order["demands"], order["stock"], order["edge_loss"], order["blade_width"])
+    print(f"{'backend':<8} {'status':<12} {'threads':>7} {'time[s]':>9} {'objective':>14} {'bound':>14} {'gap':>8}")
+    for name in args.backends:
+        if name == EXACT:
+            solved = solve_last_roll_dp(base, order["edge_loss"], order["blade_width"], order["demands"],
+                                        time_limit=args.time_limit)
+            if solved is None:
+                print(f"{name:<8} {'TOO LARGE':<12}")
+                continue
+            _, report = solved
+        else:
+            _, report = solve_last_roll(base, order["edge_loss"], order["blade_width"], order["demands"],
+                                        args.formulation, name, args.threads, args.time_limit, not args.no_warm_start,
+                                        relative_gap=args.gap)
+        if report is None:
+            print(f"{name:<8} {'SKIPPED':<12}")
+            continue
+        print(f"{name:<8} {report['status']:<12} {report['threads']:>7} {report['wall_time']:>9.2f} "
+              f"{_format(report['objective'], '{:.1f}'):>14} {_format(report['bound'], '{:.1f}'):>14} "
+              f"{_format(report['gap'] and report['gap'] * 100, '{:.2f}%'):>8}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cutting-stock")
+    commands = parser.add_subparsers(dest="command", required=True)
+    solve_cmd = commands.add_parser("solve", help="solve one order and print the plan as JSON")
+    solve_cmd.add_argument("input")
+    solve_cmd.add_argument("--engine", choices=ENGINES, default="standard")
+    solve_cmd.add_argument("--advanced", action="store_true", help="re-optimize the last roll with the MIP")
+    solve_cmd.add_argument("--formulation", choices=FORMULATIONS, default="compact")
+    solve_cmd.add_argument("--backend", choices=BACKENDS, default="SCIP")
+    solve_cmd.add_argument("--threads", type=int,
+                           help="solver threads (default: a quarter of the cores; SCIP and CBC always use one)")
+    solve_cmd.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="solver time budget in seconds")
+    solve_cmd.add_argument("--gap", type=float, default=DEFAULT_RELATIVE_GAP,
+                           help="stop the MIP once it is proven within this relative gap (0 = prove optimality)")
+    solve_cmd.add_argument("--no-warm-start", action="store_true", help="do not pass the greedy plan as a solution hint")
+    solve_cmd.add_argument("--seed", type=int, default=0, help="random seed of the multistart engine")
+    solve_cmd.add_argument("--output", "-o", help="write the JSON to this file instead of stdout")
+    solve_cmd.add_argument("--profile", action="store_true",
+                           help="include a cProfile capture and per-phase Python memory peaks in the JSON")
+    solve_cmd.add_argument("--progress", action="store_true",
+                           help="stream each improving plan to stderr as a JSON line; Ctrl+C keeps the current best")
+    solve_cmd.set_defaults(func=solve_order)
+    batch = commands.add_parser("batch", help="solve many orders in parallel and write one CSV per order")
+    batch.add_argument("inputs", nargs="+", help="order JSON files, directories of them, or a multi-order CSV")
+    batch.add_argument("--out", default="batch_results")
+    batch.add_argument("--workers", type=int, default=default_threads())
+    batch.add_argument("--engine", choices=ENGINES, default="standard")
+    batch.add_argument("--advanced", action="store_true", help="re-optimize the last roll with the MIP")
+    batch.add_argument("--formulation", choices=FORMULATIONS, default="compact")
+    batch.add_argument("--backend", choices=BACKENDS, default="SCIP")
+    batch.add_argument("--threads", type=int, default=1, help="solver threads per job")
+    batch.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="solver time budget per job")
+    batch.add_argument("--gap", type=float, default=DEFAULT_RELATIVE_GAP,
+                       help="stop the MIP once it is proven within this relative gap (0 = prove optimality)")
+    batch.add_argument("--no-warm-start", action="store_true", help="do not pass the greedy plan as a solution hint")
+    batch.add_argument("--seed", type=int, default=0, help="random seed of the multistart engine")
+    batch.set_defaults(func=batch_solve)
+    compare = commands.add_parser("compare", help="solve the same order with each MIP backend and the exact DP")
+    compare.add_argument("input")
+    compare.add_argument("--backends", nargs="+", choices=BACKENDS + (EXACT,), default=list(BACKENDS) + [EXACT])
+    compare.add_argument("--formulation", choices=FORMULATIONS, default="compact")
+    compare.add_argument("--threads", type=int,
+                         help="solver threads (default: a quarter of the cores; SCIP and CBC always use one)")
+    compare.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="solver time budget in seconds")
+    compare.add_argument("--gap", type=float, default=DEFAULT_RELATIVE_GAP,
+                         help="stop the MIP once it is proven within this relative gap (0 = prove optimality)")
+    compare.add_argument("--no-warm-start", action="store_true", help="do not pass the greedy plan as a solution hint")
+    compare.set_defaults(func=compare_backends)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
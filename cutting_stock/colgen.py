@@ -0,0 +1,254 @@
+import math
+import time
+
+import numpy as np
+
+from .patterns import roll_patterns
+from .stock import aggregate_stock
+from .units import denormalize_rolls, normalize_instance
+
+try:
+    from ortools.linear_solver import pywraplp
+    ORTOOLS_AVAILABLE = True
+except ImportError:
+    ORTOOLS_AVAILABLE = False
+
+EPS = 1e-9
+TAILING_WINDOW = 5
+TAILING_TOLERANCE = 1e-3
+# 非支配パターンの数がこれ以下のロール幅は、全パターンを初期列に入れる
+SEED_PATTERN_LIMIT = 200
+
+
+def bounded_knapsack(capacity, weights, values, upper):
+    # 有界ナップサック（二進分割 + NumPy DP）。各アイテムの本数を返す
+    counts = [0] * len(weights)
+    if capacity <= 0:
+        return counts
+    items = []
+    for i, (wt, v, ub) in enumerate(zip(weights, values, upper)):
+        if v <= EPS or ub <= 0 or wt <= 0 or wt > capacity:
+            continue
+        ub = min(ub, capacity // wt)
+        m = 1
+        while ub > 0:
+            take = min(m, ub)
+            items.append((i, take, wt * take, v * take))
+            ub -= take
+            m *= 2
+    if not items:
+        return counts
+    g = 0
+    for _, _, wt, _ in items:
+        g = math.gcd(g, wt)
+    cap = capacity // g
+    dp = np.zeros(cap + 1)
+    keep = np.zeros((len(items), cap + 1), dtype=bool)
+    for n, (_, _, wt, v) in enumerate(items):
+        wt //= g
+        if wt > cap:
+            continue
+        cand = dp[:-wt] + v
+        better = cand > dp[wt:] + EPS
+        keep[n, wt:] = better
+        dp[wt:] = np.where(better, cand, dp[wt:])
+    c = cap
+    for n in range(len(items) - 1, -1, -1):
+        if keep[n, c]:
+            i, take, wt, _ = items[n]
+            counts[i] += take
+            c -= wt // g
+    return counts
+
+
+def _greedy_pattern(capacity, weights, remaining, length, order):
+    pattern = [0] * len(weights)
+    for i in order:
+        if remaining[i] <= 0 or weights[i] <= 0 or weights[i] > capacity:
+            continue
+        k = min(capacity // weights[i], math.ceil(remaining[i] / length))
+        pattern[i] = k
+        capacity -= k * weights[i]
+    return pattern
+
+
+def _pattern_layout(pattern, demands):
+    layout = []
+    for i, k in enumerate(pattern):
+        layout.extend([demands[i]["width"]] * k)
+    layout.sort()
+    return layout
+
+
+def column_generation(demands, stock, edge_loss, blade_width, max_iterations=200, time_limit=30.0):
+    # mm単位の入出力。計算は column_generation_units（0.1mm単位の整数）で行う
+    return denormalize_rolls(column_generation_units(*normalize_instance(demands, stock, edge_loss, blade_width),
+                                                     max_iterations, time_limit))
+
+
+def column_generation_units(demands, stock, edge_loss, blade_width, max_iterations=200, time_limit=30.0):
+    # 幅は units.to_units の整数なので、ナップサックの重みと容量をそのまま使える
+    if not ORTOOLS_AVAILABLE:
+        raise RuntimeError("OR-Tools is required for the column generation engine")
+    start = time.perf_counter()
+    types = aggregate_stock(stock)
+    num_demands = len(demands)
+    weights = [d["width"] + blade_width for d in demands]
+    capacities = [t["width"] - edge_loss + blade_width for t in types]
+
+    def upper_bounds(t, remaining):
+        return [max(0, math.ceil(r / types[t]["length"])) for r in remaining]
+
+    # マスター問題（LP）：使用材料面積の最小化、不足分はペナルティ付きスラック
+    lp = pywraplp.Solver.CreateSolver("GLOP")
+    penalty = 10 * max((t["width"] for t in types), default=1.0)
+    demand_rows = []
+    for i, d in enumerate(demands):
+        row = lp.Constraint(d["length"], lp.infinity(), f"demand_{i}")
+        slack = lp.NumVar(0, lp.infinity(), f"short_{i}")
+        row.SetCoefficient(slack, 1)
+        lp.Objective().SetCoefficient(slack, penalty)
+        demand_rows.append(row)
+    stock_rows = [lp.Constraint(0, t["count"], f"stock_{t_idx}") for t_idx, t in enumerate(types)]
+    lp.Objective().SetMinimization()
+
+    columns = []
+    seen = set()
+
+    def add_column(t, pattern):
+        key = (t, tuple(pattern))
+        if key in seen or not any(pattern):
+            return False
+        seen.add(key)
+        var = lp.NumVar(0, lp.infinity(), f"z_{len(columns)}")
+        for i, k in enumerate(pattern):
+            if k:
+                demand_rows[i].SetCoefficient(var, k * types[t]["length"])
+        stock_rows[t].SetCoefficient(var, 1)
+        lp.Objective().SetCoefficient(var, types[t]["width"] * types[t]["length"])
+        columns.append((t, list(pattern), var))
+        return True
+
+    # 初期列：単一幅パターン
+    needs = [d["length"] for d in demands]
+    for t in range(len(types)):
+        ub = upper_bounds(t, needs)
+        for i in range(num_demands):
+            if weights[i] <= 0 or weights[i] > capacities[t]:
+                continue
+            pattern = [0] * num_demands
+            pattern[i] = min(capacities[t] // weights[i], ub[i])
+            add_column(t, pattern)
+    # 組合せが少なければ非支配パターンをすべて初期列にする（同じ幅のロールクラス間でメモ化を共有）。
+    # 上限を1個超えたところで列挙をやめるので、組合せが多いロール幅でも判定は安い
+    widths = tuple(d["width"] for d in demands)
+    for t, roll in enumerate(types):
+        patterns = roll_patterns(roll["width"], widths, edge_loss, blade_width, SEED_PATTERN_LIMIT + 1)
+        if len(patterns) > SEED_PATTERN_LIMIT:
+            continue
+        ub = upper_bounds(t, needs)
+        for pattern in patterns:
+            add_column(t, [min(k, u) for k, u in zip(pattern, ub)])
+    # 貪欲法（幅の広い需要から詰める）のパターンも初期列に加える
+    order = sorted(range(num_demands), key=lambda i: weights[i], reverse=True)
+    remaining = list(needs)
+    for t, roll in enumerate(types):
+        for _ in range(roll["count"]):
+            pattern = _greedy_pattern(capacities[t], weights, remaining, roll["length"], order)
+            if not any(pattern):
+                break
+            add_column(t, pattern)
+            for i, k in enumerate(pattern):
+                remaining[i] -= k * roll["length"]
+
+    status = lp.Solve()
+    history = []
+    for _ in range(max_iterations):
+        if status != pywraplp.Solver.OPTIMAL or time.perf_counter() - start > time_limit:
+            break
+        # 目的関数の改善が頭打ちになったら列生成を打ち切る
+        history.append(lp.Objective().Value())
+        if len(history) > TAILING_WINDOW and \
+                history[-TAILING_WINDOW - 1] - history[-1] <= TAILING_TOLERANCE * abs(history[-1]):
+            break
+        duals = [row.dual_value() for row in demand_rows]
+        stock_duals = [row.dual_value() for row in stock_rows]
+        added = False
+        for t, roll in enumerate(types):
+            values = [duals[i] * roll["length"] for i in range(num_demands)]
+            pattern = bounded_knapsack(capacities[t], weights, values, upper_bounds(t, needs))
+            reduced_cost = roll["width"] * roll["length"] - stock_duals[t] \
+                - sum(v * k for v, k in zip(values, pattern))
+            if reduced_cost < -EPS * max(1.0, roll["width"] * roll["length"]):
+                added |= add_column(t, pattern)
+        if not added:
+            break
+        status = lp.Solve()
+
+    # 整数化：LP解を切り捨て、残りの需要を貪欲に補修
+    available = [t["count"] for t in types]
+    chosen = [[] for _ in types]
+    remaining = list(needs)
+    for t, pattern, var in columns:
+        if status != pywraplp.Solver.OPTIMAL:
+            break
+        n = min(int(math.floor(var.solution_value() + 1e-6)), available[t])
+        if n <= 0:
+            continue
+        chosen[t].extend([pattern] * n)
+        available[t] -= n
+        for i, k in enumerate(pattern):
+            remaining[i] -= k * types[t]["length"] * n
+
+    while any(r > 0 for r in remaining):
+        best = None
+        for t, roll in enumerate(types):
+            if available[t] <= 0:
+                continue
+            pattern = _greedy_pattern(capacities[t], weights, remaining, roll["length"], order)
+            covered = sum(d["width"] * min(k * roll["length"], r)
+                          for d, k, r in zip(demands, pattern, remaining) if k)
+            if covered <= 0:
+                continue
+            ratio = covered / (roll["width"] * roll["length"])
+            if best is None or ratio > best[0]:
+                best = (ratio, t, pattern)
+        if best is None:
+            break
+        _, t, pattern = best
+        repeat = available[t]
+        for i, k in enumerate(pattern):
+            if k:
+                repeat = min(repeat, max(1, int(remaining[i] // (k * types[t]["length"]))))
+        chosen[t].extend([pattern] * repeat)
+        available[t] -= repeat
+        for i, k in enumerate(pattern):
+            remaining[i] -= k * types[t]["length"] * repeat
+
+    results = []
+    for t, roll in enumerate(types):
+        groups = {}
+        for pattern in chosen[t]:
+            key = tuple(_pattern_layout(pattern, demands))
+            groups[key] = groups.get(key, 0) + 1
+        for key, count in groups.items():
+            layout = list(key)
+            used = sum(layout) + blade_width * (len(layout) - 1)
+            results.append({
+                "width": roll["width"],
+                "length": roll["length"],
+                "count": count,
+                "cuts": len(layout),
+                "layout": layout,
+                "remain": roll["width"] - edge_loss - used
+            })
+        if available[t] > 0:
+            results.append({
+                "width": roll["width"],
+                "length": roll["length"],
+                "count": available[t],
+                "cuts": 0,
+                "layout": [],
+                "remain": roll["width"] - edge_loss
+            })
+    return results
@@ -0,0 +1,117 @@
+import math
+import time
+
+# 動的計画法で厳密に解くdemand数の上限と、割付の列挙数と状態遷移数の合計の上限（超えたら諦めてMIPに回す）
+DP_MAX_DEMANDS = 4
+DP_WORK_LIMIT = 300_000
+
+
+class TooLarge(Exception):
+    pass
+
+
+def cut_options(capacity, demands, length, blade_width, limit=None):
+    # ロール1本の割付（demandごとのカット本数）をすべて列挙する（空の割付も含む）。
+    # 1本のロールで ceil(必要長さ/巻長) 本を超えるカットは作らない（MIPの変数の上限と同じ）。
+    # limit を超える数の割付が見つかったら TooLarge（細い幅が多いと割付の数は組合せ的に増える）
+    steps = [d["width"] + blade_width for d in demands]
+    limits = [min(math.ceil(d["length"] / length), capacity // step) for d, step in zip(demands, steps)]
+    found = []
+    cuts = []
+
+    def extend(i, remain):
+        if i == len(demands):
+            found.append(tuple(cuts))
+            if limit is not None and len(found) > limit:
+                raise TooLarge()
+            return
+        for k in range(min(limits[i], remain // steps[i]) + 1):
+            cuts.append(k)
+            extend(i + 1, remain - k * steps[i])
+            cuts.pop()
+
+    extend(0, capacity)
+    return found
+
+
+def exact_assignment(demands, target_class, classes, edge_loss, blade_width, width_scale, work_limit=DP_WORK_LIMIT,
+                     deadline=None, control=None):
+    # model.py のMIPと同じ問題（ターゲット1本＋クラスごとの残り本数、同じ目的関数と生産量の上下限）を、
+    # ロール1本ずつ割付を選ぶ動的計画法で厳密に解く。状態はdemandごとの生産量（上限で打ち切るので有限）。
+    # MIPと違いクラス内の割付の種類数に枠の制限はない。幅は units.to_units の整数、巻長・必要長さも整数
+    # target_class, classes のキー: (幅, 巻長)。classes の値はターゲットを除く本数
+    # 戻り値: (目的関数値, ターゲットの割付, {クラス: {割付: 本数}})。実行不可能なら None。
+    # 割付の列挙と状態遷移の合計が work_limit を超えたとき、deadline（time.perf_counter の値）を過ぎたとき、
+    # control がキャンセルされたときは TooLarge
+    lengths = [target_class[1]] + [key[1] for key in classes]
+    upper = [min(math.ceil(d["length"] / length) * length for length in lengths) for d in demands]
+    steps = [(target_class, True)] + [(key, False) for key, count in classes.items() for _ in range(count)]
+    work = 0
+
+    def check():
+        if work > work_limit:
+            raise TooLarge()
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TooLarge()
+        if control is not None and control.cancelled:
+            raise TooLarge()
+
+    options = {}
+    for key, is_target in steps:
+        if (key, is_target) in options:
+            continue
+        check()
+        capacity = key[0] - edge_loss + blade_width
+        found = []
+        enumerated = cut_options(capacity, demands, key[1], blade_width, work_limit - work)
+        work += len(enumerated)
+        for cuts in enumerated:
+            remain = capacity - sum(k * (d["width"] + blade_width) for k, d in zip(cuts, demands))
+            if is_target and not demands:
+                remain = key[0] - edge_loss
+            types = sum(1 for k in cuts if k)
+            gain = remain * 1000 if is_target else -remain * 100
+            found.append((gain - types * 10 * width_scale, tuple(k * key[1] for k in cuts), cuts))
+        options[key, is_target] = found
+
+    # reach[s][i] = s番目以降のロールで作れるdemand iの最大生産量（必要長さに届かない状態を早めに捨てる）
+    reach = [[0] * len(demands)]
+    for step in reversed(steps):
+        most = [max(produced[i] for _, produced, _ in options[step]) for i in range(len(demands))]
+        reach.append([r + m for r, m in zip(reach[-1], most)])
+    reach.reverse()
+
+    layers = []
+    states = {(0,) * len(demands): (0, None, None)}
+    for index, step in enumerate(steps):
+        choices = options[step]
+        later = reach[index + 1]
+        work += len(states) * len(choices)
+        check()
+        following = {}
+        for state, (value, _, _) in states.items():
+            for gain, produced, cuts in choices:
+                new = tuple(v + p for v, p in zip(state, produced))
+                if any(v > u or v + r < d["length"] for v, u, r, d in zip(new, upper, later, demands)):
+                    continue
+                total = value + gain
+                if new not in following or total > following[new][0]:
+                    following[new] = (total, state, cuts)
+        layers.append(following)
+        states = following
+
+    if not states:
+        return None
+    # 残った状態はすべて必要長さを満たす
+    state = max(states, key=lambda s: (states[s][0], s))
+    objective = states[state][0]
+    chosen = []
+    for layer in reversed(layers):
+        _, state, cuts = layer[state]
+        chosen.append(cuts)
+    chosen.reverse()
+    counts = {}
+    for (key, _), cuts in zip(steps[1:], chosen[1:]):
+        patterns = counts.setdefault(key, {})
+        patterns[cuts] = patterns.get(cuts, 0) + 1
+    return objective, chosen[0], counts
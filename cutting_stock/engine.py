@@ -0,0 +1,262 @@
+from .backends import FEASIBLE, INFEASIBLE, ORTOOLS_AVAILABLE, SINGLE_THREADED, UNAVAILABLE, solver_threads
+from .cache import canonical_key
+from .colgen import column_generation_units
+from .greedy import assign_rolls_units, can_cut_any
+from .lns import lns_units
+from .multistart import DEFAULT_TIME_LIMIT as MULTISTART_TIME_LIMIT, multistart_units
+from .optimize import (DEFAULT_RELATIVE_GAP, DEFAULT_TIME_LIMIT, DIAGNOSIS_TIME_LIMIT, ConvertingControl,
+                       diagnose_last_roll_units, optimize_last_roll_units)
+from .preflight import denormalize_preflight, line_deficits, preflight
+from .presolve import postsolve, presolve
+from .profiling import PhaseRecorder, phase, profiled, recording
+from .units import denormalize_rolls, from_units, normalize_instance, to_units
+
+ENGINES = ("standard", "colgen", "multistart", "lns")
+# 画面やCLIが表示文言に対応付けるメッセージコード
+NO_FIT = "no_fit"
+ORTOOLS_MISSING = "ortools_missing"
+SOLVER_UNAVAILABLE = "solver_unavailable"
+SOLVER_FAILED = "solver_failed"
+SOLVER_ERROR = "solver_error"
+SOLVER_CANCELLED = "solver_cancelled"
+SHORTAGE = "shortage"
+SOLVER_SKIPPED = "solver_skipped"
+QUEUE_CANCELLED = "queue_cancelled"
+ERROR = "ERROR"
+# これらのメッセージが出た結果はフォールバックや途中打ち切りなので再利用しない
+FALLBACK_MESSAGES = (ORTOOLS_MISSING, SOLVER_UNAVAILABLE, SOLVER_FAILED, SOLVER_ERROR, SOLVER_CANCELLED,
+                     QUEUE_CANCELLED)
+
+
+def shortages(demands, rolls):
+    # 必要長さに届かないdemandのインデックス。同じ幅の生産量は行の順に割り当てる
+    produced = {}
+    for r in rolls:
+        for w in r["layout"]:
+            produced[w] = produced.get(w, 0) + r["length"] * r["count"]
+    short = []
+    for i, d in enumerate(demands):
+        done = min(produced.get(d["width"], 0), d["length"])
+        produced[d["width"]] = produced.get(d["width"], 0) - done
+        if done < d["length"]:
+            short.append(i)
+    return short
+
+
+def _move_target_last(rolls):
+    # 再配置の対象ロール（最も幅が広く巻長が長いもの）を最後に表示する
+    target_index = -1
+    max_score = -1
+    for idx, r in enumerate(rolls):
+        score = r["width"] * 1000 + r["length"]
+        if score > max_score:
+            max_score = score
+            target_index = idx
+    if target_index == -1 or target_index == len(rolls) - 1:
+        return rolls
+    return [r for idx, r in enumerate(rolls) if idx != target_index] + [rolls[target_index]]
+
+
+def _optimize(rolls, demands, edge_loss, blade_width, formulation, backend, threads, warm_start, time_limit,
+              relative_gap, control, messages):
+    try:
+        new_rolls, report = optimize_last_roll_units(rolls, edge_loss, blade_width, demands, formulation, backend,
+                                                     threads, time_limit, warm_start, control, relative_gap)
+    except Exception as e:
+        messages.append(SOLVER_ERROR)
+        return rolls, {"backend": backend, "status": ERROR, "wall_time": 0.0, "threads": threads,
+                       "objective": None, "bound": None, "gap": None, "error": str(e)}
+    if report is None:
+        return rolls, None
+    if control is not None and control.cancelled:
+        messages.append(SOLVER_CANCELLED)
+    if report["status"] == UNAVAILABLE:
+        messages.append(SOLVER_UNAVAILABLE)
+        return rolls, report
+    if new_rolls is None:
+        messages.append(SOLVER_FAILED)
+        if report["status"] == INFEASIBLE and not (control is not None and control.cancelled):
+            # どの作業指示の行が満たせないかを診断する（ソルバーで解き直しても同じ結果になるため）
+            with phase("diagnosis"):
+                report["diagnosis"] = diagnose_last_roll_units(rolls, edge_loss, blade_width, demands, backend,
+                                                               threads, min(time_limit, DIAGNOSIS_TIME_LIMIT), control)
+        return rolls, report
+    return new_rolls, report
+
+
+def _denormalize_diagnosis(diagnosis):
+    return dict(diagnosis, conflicts=[dict(c, width=from_units(c["width"])) for c in diagnosis["conflicts"]])
+
+
+def _with_lines(result, demands):
+    # キャッシュする結果は行の並びによらない（不足・診断は幅ごと）ので、行番号は呼び出し元の行で付ける
+    # - preflight の deficits: 行ごとの不足（preflight.line_deficits）
+    # - 診断の conflicts: その幅の行番号（1始まり）の lines
+    lines, _, _, _ = normalize_instance(demands, [], 0, 0)
+    check = result["preflight"]
+    if check is not None:
+        deficits = line_deficits([dict(d, width=to_units(d["width"])) for d in check["deficits"]], lines)
+        check = dict(check, deficits=[dict(d, width=from_units(d["width"])) for d in deficits])
+    report = result["report"]
+    if report is not None and report.get("diagnosis"):
+        conflicts = [dict(c, lines=[k + 1 for k, line in enumerate(lines) if line["width"] == to_units(c["width"])])
+                     for c in report["diagnosis"]["conflicts"]]
+        report = dict(report, diagnosis=dict(report["diagnosis"], conflicts=conflicts))
+    return dict(result, preflight=check, report=report)
+
+
+def _solve(demands, stock, edge_loss, blade_width, engine, advanced, formulation, backend, threads, warm_start,
+           time_limit, relative_gap, control, seed):
+    # 幅は入口で0.1mm単位の整数にし、結果を返すときにmmへ戻す。各エンジンには presolve で縮めた問題を渡し、
+    # 不足の一覧は元の行で作る
+    with phase("presolve"):
+        lines, stock, edge_loss, blade_width = normalize_instance(demands, stock, edge_loss, blade_width)
+        demands, stock, dropped = presolve(lines, stock, edge_loss, blade_width)
+    messages = []
+    report = None
+    if engine != "standard":
+        advanced = False
+    if engine in ("colgen", "lns") or advanced:
+        if not ORTOOLS_AVAILABLE:
+            messages.append(ORTOOLS_MISSING)
+            engine, advanced = "standard", False
+    with phase("preflight"):
+        # 判定は presolve 後の問題で行う（どのロールにも入らない行は外してあるので、それだけでMIPを飛ばさない）。
+        # 不足の一覧は元の行から作り、入らない行も不足として報告する
+        check = dict(preflight(demands, stock, edge_loss, blade_width),
+                     deficits=preflight(lines, stock, edge_loss, blade_width)["deficits"])
+    if (engine == "lns" or advanced) and not check["feasible"]:
+        # 在庫不足が確定しているとMIPは実行不可能なので、時間を使わずに貪欲法の結果を返す
+        messages.append(SOLVER_SKIPPED)
+        engine, advanced = "standard", False
+    if control is not None:
+        # 暫定解の計画も最終結果と同じ形（元の問題・mm単位、再配置の対象ロールは最後）にして通知する
+        control = ConvertingControl(control, lambda rolls: denormalize_rolls(
+            postsolve(_move_target_last(rolls) if advanced else rolls, dropped, edge_loss)))
+    if not can_cut_any(demands, stock, edge_loss, blade_width):
+        messages.append(NO_FIT)
+        rolls = []
+    elif engine == "colgen":
+        with phase("colgen"):
+            rolls = column_generation_units(demands, stock, edge_loss, blade_width, time_limit=time_limit)
+    elif engine == "multistart":
+        with phase("multistart"):
+            rolls = multistart_units(demands, stock, edge_loss, blade_width, seed=seed, workers=threads,
+                                     time_limit=min(time_limit, MULTISTART_TIME_LIMIT), control=control)
+        if control is not None and control.cancelled:
+            messages.append(SOLVER_CANCELLED)
+    elif engine == "lns":
+        with phase("lns"):
+            rolls, report = lns_units(demands, stock, edge_loss, blade_width, None, formulation, backend, threads,
+                                      time_limit, seed=seed, control=control, relative_gap=relative_gap)
+        if control is not None and control.cancelled:
+            messages.append(SOLVER_CANCELLED)
+    else:
+        with phase("greedy"):
+            rolls = assign_rolls_units(demands, stock, edge_loss, blade_width)
+        if advanced:
+            if control is not None:
+                # ソルバーが最初の改善解を見つける前から、開始点の計画（貪欲法）を表示できるようにする
+                control.incumbent(None, None, rolls)
+            with phase("optimize"):
+                rolls, report = _optimize(rolls, demands, edge_loss, blade_width, formulation, backend, threads,
+                                          warm_start, time_limit, relative_gap, control, messages)
+            if len(rolls) > 1:
+                rolls = _move_target_last(rolls)
+    if report is not None and report.get("diagnosis"):
+        report["diagnosis"] = _denormalize_diagnosis(report["diagnosis"])
+    with phase("postsolve"):
+        rolls = postsolve(rolls, dropped, edge_loss)
+        if shortages(lines, rolls):
+            messages.append(SHORTAGE)
+        rolls = denormalize_rolls(rolls)
+    return {"rolls": rolls, "report": report, "messages": messages,
+            "preflight": denormalize_preflight(check)}
+
+
+def solve_key(demands, stock, edge_loss, blade_width, engine="standard", advanced=False, formulation="compact",
+              backend="SCIP", warm_start=True, seed=0, relative_gap=DEFAULT_RELATIVE_GAP,
+              time_limit=DEFAULT_TIME_LIMIT):
+    # 結果を左右する入力だけのキー（スレッド数は含めない）。時間制限は、締切で止まった結果もそのまま返すエンジン
+    # （colgen・multistart・LNS）だけ含める。MIPの再配置は時間制限で打ち切った結果を再利用しないので含めない
+    if engine == "colgen":
+        options = {"time_limit": float(time_limit)}
+    elif engine == "multistart":
+        options = {"seed": seed, "time_limit": float(min(time_limit, MULTISTART_TIME_LIMIT))}
+    elif engine == "lns":
+        options = {"formulation": formulation, "backend": backend, "seed": seed, "relative_gap": relative_gap,
+                   "time_limit": float(time_limit)}
+    elif advanced:
+        options = {"advanced": True, "formulation": formulation, "backend": backend, "warm_start": warm_start,
+                   "relative_gap": relative_gap}
+    else:
+        options = {"advanced": False}
+    return canonical_key(demands, stock, edge_loss, blade_width, engine, **options)
+
+
+def solve_threads(engine="standard", advanced=False, threads=None, backend="SCIP"):
+    # 1回の求解で同時に使うコア数（ジョブの受付制御で予約する分）。既定はコアの一部（backends.solver_threads）
+    if engine == "multistart":
+        return threads or solver_threads()
+    if engine == "lns" or (engine == "standard" and advanced):
+        return 1 if backend in SINGLE_THREADED else threads or solver_threads(backend)
+    return 1
+
+
+def stopped_early(report):
+    # MIPが時間制限で打ち切られ、許容ギャップ以内と証明できていない（予算を増やせば良くなりうる）。
+    # LNSなどギャップを持たないレポートは対象外
+    if report is None or report["status"] != FEASIBLE or "gap_limit" not in report:
+        return False
+    return report["gap"] is None or report["gap_limit"] is None or report["gap"] > report["gap_limit"]
+
+
+def is_reusable(result):
+    if stopped_early(result["report"]):
+        return False
+    return not any(code in FALLBACK_MESSAGES for code in result["messages"])
+
+
+def solve(demands, stock, edge_loss, blade_width, engine="standard", advanced=False, formulation="compact",
+          backend="SCIP", threads=None, warm_start=True, time_limit=DEFAULT_TIME_LIMIT, cache=None, control=None, seed=0,
+          relative_gap=DEFAULT_RELATIVE_GAP, profile=False):
+    # 戻り値: {"rolls": 結果行のリスト, "report": ソルバー実行レポート or None,
+    #          "messages": メッセージコードのリスト, "preflight": preflight.preflight の結果（mm単位）,
+    #          "cache_hit": キャッシュから返したか, "timings": profiling.PhaseRecorder の段階の記録,
+    #          "profile": profile=True なら cProfile の累積時間の上位（文字列）、それ以外は None}
+    # profile=True なら timings に段階ごとのPythonのメモリ割り当ての最大（memory_mb）も入る
+    # stock は aggregate_stock 済みのロールクラス。Streamlitに依存しないのでワーカープロセスから呼べる
+    # control はMIPのキャンセルと暫定解の通知、スレッドの予約に使う（jobs.SolveJob を参照）。
+    # 予約できたスレッド数で解く（最後のロールの再配置は、MIPに回すときにMIPの分を予約する）。
+    # キャッシュにあれば予約を待たずに返す
+    # time_limit はソルバーの時間予算、relative_gap はそれより前に止めてよい相対ギャップ（None なら証明まで）
+    def compute():
+        if control is None:
+            return _solve(demands, stock, edge_loss, blade_width, engine, advanced, formulation, backend, threads,
+                          warm_start, time_limit, relative_gap, control, seed)
+        wanted = solve_threads(engine, advanced, threads, backend)
+        # 再配置は動的計画法で解ければ1スレッドで足りるので、最初は1スレッドだけ予約し、
+        # MIPに回すときに optimize_last_roll_units が予約し直す
+        deferred = engine == "standard" and advanced and wanted > 1
+        with phase("queue"):
+            granted = control.reserve(1 if deferred else wanted)
+        if not granted:
+            return {"rolls": [], "report": None, "messages": [QUEUE_CANCELLED], "preflight": None}
+        try:
+            return _solve(demands, stock, edge_loss, blade_width, engine, advanced, formulation, backend,
+                          wanted if deferred else granted, warm_start, time_limit, relative_gap, control, seed)
+        finally:
+            control.release()
+
+    def run():
+        if cache is None:
+            return dict(compute(), cache_hit=False)
+        key = solve_key(demands, stock, edge_loss, blade_width, engine, advanced, formulation, backend, warm_start,
+                        seed, relative_gap, time_limit)
+        result, hit = cache.cached(key, compute, is_reusable)
+        return dict(result, cache_hit=hit)
+
+    # 段階ごとの計測はキャッシュに入れず、毎回この呼び出しの分を返す
+    with recording(PhaseRecorder(trace_memory=profile)) as recorder, profiled(profile) as capture:
+        result = run()
+    return dict(_with_lines(result, demands), timings=recorder.phases, profile=capture["text"])
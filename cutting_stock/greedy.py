@@ -0,0 +1,111 @@
+import copy
+from math import ceil
+
+from .units import denormalize_rolls, normalize_instance
+
+
+def can_cut_any(demands, stock, edge_loss, blade_width):
+    # 物理的にカット可能な組み合わせが1つでもあるか
+    for d in demands:
+        for s in stock:
+            if s["width"] - edge_loss >= d["width"] + blade_width:
+                return True
+    return False
+
+
+def repeat_count(left, applied, length):
+    # 同じ割付を繰り返せる本数（残り需要が変わるまで同一レイアウトになる）。
+    # applied: 割付に使ったdemandごとの (このロールを割り付ける前の残り必要長さ, カット本数)
+    repeat = left
+    for need, cuts in applied:
+        repeat = min(repeat, ceil((need - (cuts - 1) * length) / (cuts * length)))
+    return repeat
+
+
+def assign_rolls(demands, stock, edge_loss, blade_width):
+    demand_needs = copy.deepcopy(demands)
+    sorted_stock = sorted(stock, key=lambda x: (x["width"], x["length"]))
+    results = []
+    if not can_cut_any(demand_needs, sorted_stock, edge_loss, blade_width):
+        return []
+    for roll in sorted_stock:
+        left = roll["count"]
+        while left > 0:
+            remain_w = roll["width"] - edge_loss
+            layout = []
+            applied = []
+            for d in sorted(demand_needs, key=lambda x: x["width"], reverse=True):
+                w = d["width"]
+                before = d["length"]
+                needed_cuts = ceil(d["length"] / roll["length"])
+                cuts = 0
+                while d["length"] > 0 and remain_w >= w + blade_width and cuts < needed_cuts:
+                    layout.append(w)
+                    remain_w -= (w + blade_width)
+                    d["length"] -= roll["length"]
+                    cuts += 1
+                if cuts:
+                    applied.append((d, before, cuts))
+            repeat = repeat_count(left, [(before, cuts) for _, before, cuts in applied], roll["length"])
+            for d, before, cuts in applied:
+                d["length"] -= (repeat - 1) * cuts * roll["length"]
+            results.append({
+                "width": roll["width"],
+                "length": roll["length"],
+                "count": repeat,
+                "cuts": len(layout),
+                "layout": layout,
+                "remain": remain_w
+            })
+            left -= repeat
+    return results
+
+
+def assign_rolls_fast(demands, stock, edge_loss, blade_width):
+    # mm単位の入出力。計算は assign_rolls_units（0.1mm単位の整数）で行う
+    return denormalize_rolls(assign_rolls_units(*normalize_instance(demands, stock, edge_loss, blade_width)))
+
+
+def assign_rolls_units(demands, stock, edge_loss, blade_width):
+    # assign_rolls と同じ順序規則（細く短いロールから、広い幅のdemandから）で、カット本数を
+    # min(floor(残り幅 / (幅+刃幅)), 必要カット数) として1回で求め、同じ割付はまとめて repeat_count 本にする。
+    # 幅は units.to_units の整数なので、ぴったり収まる境界で浮動小数の誤差によりカットを落とさない
+    if not can_cut_any(demands, stock, edge_loss, blade_width):
+        return []
+    order = sorted(range(len(demands)), key=lambda i: -demands[i]["width"])
+    widths = [demands[i]["width"] for i in order]
+    steps = [w + blade_width for w in widths]
+    needs = [demands[i]["length"] for i in order]
+    # 残り需要のあるdemand（幅の広い順）。需要を満たしたものは外していく
+    active = [i for i in range(len(order)) if needs[i] > 0 and steps[i] > 0]
+    results = []
+    for roll in sorted(stock, key=lambda x: (x["width"], x["length"])):
+        length = roll["length"]
+        capacity = roll["width"] - edge_loss
+        left = roll["count"]
+        while left > 0:
+            remain = capacity
+            applied = []
+            for i in active:
+                if remain < steps[i]:
+                    continue
+                cuts = min(remain // steps[i], ceil(needs[i] / length))
+                remain -= cuts * steps[i]
+                applied.append((i, cuts))
+            repeat = repeat_count(left, [(needs[i], cuts) for i, cuts in applied], length)
+            layout = []
+            for i, cuts in applied:
+                needs[i] -= repeat * cuts * length
+                layout.extend([widths[i]] * cuts)
+            if applied:
+                active = [i for i in active if needs[i] > 0]
+            results.append({
+                "width": roll["width"],
+                "length": roll["length"],
+                "count": repeat,
+                "cuts": len(layout),
+                "layout": layout,
+                "remain": remain
+            })
+            left -= repeat
+    return results
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from .admission import ADMISSION
+from .engine import solve
+
+
+class SolveJob:
+    # engine.solve をバックグラウンドスレッドで実行する。画面側はハンドルを保持して状態をポーリングし、
+    # cancel() でMIPを止めるとその時点の最良解（なければ貪欲法の結果）が結果になる。
+    # ソルバーのスレッドは admission（既定はプロセス共通）から予約し、空くまで順番待ちする。
+    # 暫定解は events に到着順にたまり、on_event を渡すとソルバーのスレッドからも呼ばれる
+    def __init__(self, *args, admission=None, on_event=None, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.admission = admission or ADMISSION
+        self.on_event = on_event
+        self.events = []
+        self._reserved = 0
+        self.started = time.perf_counter()
+        self.finished = None
+        self.cancelled = False
+        self.best_objective = None
+        self.best_bound = None
+        self.result = None
+        self.error = None
+        self._solver = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.result = solve(*self.args, control=self, **self.kwargs)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.finished = time.perf_counter()
+
+    def reserve(self, threads):
+        # 戻り値: 予約できたスレッド数。順番待ちの間にキャンセルされたら 0。
+        # 別の数を予約済みなら一度返してから並び直す（再配置をMIPに回すときに1スレッドから増やす）
+        if self._reserved and self._reserved == min(threads, self.admission.capacity):
+            return self._reserved
+        self.release()
+        self._reserved = self.admission.acquire(self, threads, lambda: self.cancelled)
+        return self._reserved
+
+    def release(self):
+        if self._reserved:
+            self.admission.release(self._reserved)
+            self._reserved = 0
+
+    def attach(self, solver):
+        with self._lock:
+            self._solver = solver
+
+    def incumbent(self, objective, bound, rolls=None):
+        # 目的関数値が None の通知は開始点の計画（ソルバーが改善解を見つける前）。
+        # remnant は最後の行（MIPでは再配置の対象ロール。engine._move_target_last）の端材で、結果の表の最後の行と同じ
+        event = {"elapsed": self.elapsed, "objective": objective, "bound": bound, "rolls": rolls,
+                 "remnant": rolls[-1]["remain"] if rolls else None}
+        with self._lock:
+            if objective is not None:
+                self.best_objective = objective
+                self.best_bound = bound
+            self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+    @property
+    def latest_plan(self):
+        # 計画付きの最新の通知（なければ None）
+        with self._lock:
+            return next((e for e in reversed(self.events) if e["rolls"] is not None), None)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            solver = self._solver
+        if solver is not None and not self.done:
+            solver.interrupt()
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+    @property
+    def queue_position(self):
+        return self.admission.position(self)
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return self.done
@@ -0,0 +1,114 @@
+import random
+import time
+
+from .backends import FEASIBLE, OPTIMAL
+from .greedy import assign_rolls_units
+from .multistart import plan_score
+from .optimize import DEFAULT_RELATIVE_GAP, solve_window_units
+from .units import WIDTH_SCALE
+
+DEFAULT_WINDOW = 3
+# 部分問題1回あたりの時間制限（小さな窓なら通常は最適性の証明まで終わる）
+SUB_TIME_LIMIT = 0.5
+
+
+class _SubControl:
+    # 部分問題のソルバーをキャンセル対象として親に渡す。部分問題の目的関数値は全体の値ではないので通知しない
+    def __init__(self, control):
+        self.control = control
+
+    @property
+    def cancelled(self):
+        return self.control.cancelled
+
+    def attach(self, solver):
+        self.control.attach(solver)
+
+    def incumbent(self, objective, bound, rolls=None):
+        pass
+
+
+def _residual_demands(demands, rolls, window):
+    # 窓の外のロールで作られる分を差し引いた、幅ごとの残り必要長さ。
+    # 窓内の割付に現れる幅は足りていても長さ0で残す（割付を部分問題のヒントに対応付けるため）
+    needed = {}
+    for d in demands:
+        needed[d["width"]] = needed.get(d["width"], 0) + d["length"]
+    for idx, r in enumerate(rolls):
+        if idx in window:
+            continue
+        for w in r["layout"]:
+            if w in needed:
+                needed[w] -= r["length"] * r["count"]
+    in_window = {w for idx in window for w in rolls[idx]["layout"]}
+    return [{"width": w, "length": max(n, 0)} for w, n in sorted(needed.items(), reverse=True)
+            if n > 0 or w in in_window]
+
+
+def _proven(report):
+    if report["status"] == OPTIMAL:
+        return True
+    return report["gap"] is not None and bool(report.get("gap_limit")) and report["gap"] <= report["gap_limit"]
+
+
+def _pick_window(rolls, rng, size):
+    # 使用中のロール行から窓を選ぶ。幅の近い行をまとめると組み替えの余地が大きいので、幅順の連続区間を優先する
+    used = sorted((idx for idx, r in enumerate(rolls) if r["layout"]), key=lambda i: (rolls[i]["width"], i))
+    if len(used) <= size:
+        return set(used)
+    if rng.random() < 0.5:
+        start = rng.randrange(len(used) - size + 1)
+        return set(used[start:start + size])
+    return set(rng.sample(used, size))
+
+
+def lns_units(demands, stock, edge_loss, blade_width, rolls=None, formulation="compact", backend="SCIP",
+              threads=None, time_limit=30.0, window=DEFAULT_WINDOW, sub_time_limit=SUB_TIME_LIMIT, seed=0,
+              control=None, relative_gap=DEFAULT_RELATIVE_GAP):
+    # 貪欲法の計画から始め、使用中のロールの小さな窓とそれが担う需要を解放して、solve_window_units で部分問題を解き直す
+    # （窓のロールで端材＋過剰生産面積を最小化し、不要になったロールは空ける）。
+    # 評価（不足面積、端材＋過剰生産面積）が改善したら採用し、締切まで繰り返す。幅は units.to_units の整数
+    # 戻り値: (計画, 実行レポート)。レポートと途中経過の目的関数値は端材＋過剰生産面積（mm×M）。
+    # 改善するたびに control.incumbent にその時点の計画も渡す
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    rolls = rolls if rolls is not None else assign_rolls_units(demands, stock, edge_loss, blade_width)
+    best = plan_score(rolls, demands, edge_loss, blade_width)
+    sub_control = _SubControl(control) if control is not None else None
+    if control is not None:
+        control.incumbent(best[1] / WIDTH_SCALE, None, rolls)
+    iterations = improvements = 0
+    # 部分問題が時間切れで終わったら時間を倍にする（全体の1/4まで）
+    sub_limit = sub_time_limit
+    while time.perf_counter() - start < time_limit:
+        if control is not None and control.cancelled:
+            break
+        iterations += 1
+        # 使用中の行の窓に、未使用のロールをすべて加える（より合う幅・巻長のロールに置き換えられるように）
+        chosen = _pick_window(rolls, rng, rng.randint(2, max(2, window)))
+        chosen |= {idx for idx, r in enumerate(rolls) if not r["layout"]}
+        sub_demands = _residual_demands(demands, rolls, chosen)
+        sub_rolls = [rolls[idx] for idx in sorted(chosen)]
+        remaining = time_limit - (time.perf_counter() - start)
+        new_rows, report = solve_window_units(sub_rolls, edge_loss, blade_width, sub_demands, formulation, backend,
+                                              threads, min(sub_limit, max(remaining, 0.01)), True, sub_control,
+                                              relative_gap)
+        if report is not None and not _proven(report):
+            sub_limit = min(sub_limit * 2, max(time_limit / 4, sub_time_limit))
+        if new_rows is None:
+            continue
+        # 窓が計画全体で、部分問題の最適性（許容ギャップ以内）が証明できたら、これ以上は良くならない
+        whole = len(chosen) == len(rolls)
+        candidate = [r for idx, r in enumerate(rolls) if idx not in chosen] + new_rows
+        score = plan_score(candidate, demands, edge_loss, blade_width)
+        if score < best:
+            rolls, best = candidate, score
+            improvements += 1
+            if control is not None:
+                control.incumbent(best[1] / WIDTH_SCALE, None, rolls)
+        if whole and _proven(report):
+            break
+    rolls = sorted(rolls, key=lambda r: (r["width"], r["length"], not r["layout"]))
+    return rolls, {"backend": f"LNS/{backend}", "status": FEASIBLE, "wall_time": time.perf_counter() - start,
+                   "threads": threads, "objective": best[1] / WIDTH_SCALE, "bound": None, "gap": None,
+                   "iterations": iterations, "improvements": improvements}
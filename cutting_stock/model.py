@@ -0,0 +1,342 @@
+import math
+
+import numpy as np
+
+# 同一クラスのロールに割り当てる割付パターンの枠数（貪欲法のパターン数＋追加分）
+EXTRA_SLOTS = 2
+FORMULATIONS = ("compact", "onehot")
+
+
+def integer_lengths(demands, slots):
+    # 整数係数のみのソルバー向け：巻長・必要長さが小数なら0.1M単位の整数にする（幅は元から整数）
+    lengths = [d["length"] for d in demands] + [s["length"] for s in slots]
+    length_scale = 1 if all(float(v).is_integer() for v in lengths) else 10
+    scaled_demands = [dict(d, length=int(round(d["length"] * length_scale))) for d in demands]
+    scaled_slots = [dict(s, length=int(round(s["length"] * length_scale))) for s in slots]
+    return scaled_demands, scaled_slots
+
+
+def cut_limits(demands, slots, edge_loss, blade_width):
+    # limits[i][j] = ロールjに入るdemand iの最大カット本数（物理的に入る本数と ceil(必要長さ/巻長) の小さい方）。
+    # 0の組（ロールが狭すぎる）には変数を作らない。幅は units.to_units の整数
+    if not demands or not slots:
+        return [[0] * len(slots) for _ in demands]
+    steps = np.array([d["width"] + blade_width for d in demands], dtype=np.int64)
+    needs = np.array([d["length"] for d in demands], dtype=float)
+    capacity = np.array([s["width"] - edge_loss + blade_width for s in slots], dtype=np.int64)
+    lengths = np.array([s["length"] for s in slots], dtype=float)
+    by_width = np.maximum(capacity, 0)[None, :] // steps[:, None]
+    by_need = np.ceil(needs[:, None] / lengths[None, :]).astype(np.int64)
+    return np.minimum(by_width, by_need).tolist()
+
+
+def select_target(results):
+    # 使用済みロールのうち最も幅が広く、巻長が長いもの
+    target_index = -1
+    max_score = -1
+    for idx, r in enumerate(results):
+        if not r["layout"]:
+            continue
+        score = r["width"] * 1000 + r["length"]
+        if score > max_score:
+            max_score = score
+            target_index = idx
+    return target_index
+
+
+def build_slots(results, target_index, include_unused=False):
+    # 使用済みロール（include_unused なら未使用の行も）をクラス（幅・巻長）ごとに集計。rows は集計した行の番号
+    roll_classes = {}
+    for idx, r in enumerate(results):
+        if not r["layout"] and not include_unused:
+            continue
+        key = (r["width"], r["length"])
+        if key not in roll_classes:
+            roll_classes[key] = {"count": 0, "patterns": set(), "first_idx": idx, "rows": set()}
+        roll_classes[key]["count"] += r["count"]
+        roll_classes[key]["rows"].add(idx)
+        if r["layout"]:
+            roll_classes[key]["patterns"].add(tuple(r["layout"]))
+    target_key = None if target_index is None else (results[target_index]["width"], results[target_index]["length"])
+
+    # 割付パターンの枠：ターゲットは1本固定、その他はクラスごとに本数n（整数変数）を持つ。
+    # target_index が None ならターゲットの枠は作らない（LNSの窓）
+    slots = []
+    for key in sorted(roll_classes):
+        rc = roll_classes[key]
+        m = rc["count"]
+        if key == target_key:
+            slots.append({"width": key[0], "length": key[1], "class": key, "max_n": 1, "is_target": True})
+            m -= 1
+        if m <= 0:
+            continue
+        for _ in range(min(m, len(rc["patterns"]) + EXTRA_SLOTS)):
+            slots.append({"width": key[0], "length": key[1], "class": key, "max_n": m, "is_target": False})
+    return roll_classes, slots
+
+
+class CuttingModel:
+    def __init__(self, demands, slots, width_scale=1, elastic=False, window=False):
+        self.demands = demands
+        self.slots = slots
+        self.width_scale = width_scale
+        # elastic: 必要長さ・過剰生産の上限に違反量の変数を付け、違反する制約の数（次に違反量）を最小化する（診断用）
+        self.elastic = elastic
+        # window: ターゲットなしで、クラスのロールを使い切らなくてよい。使ったロールの面積（刃幅分を除く）を最小化する
+        # （＝端材＋過剰生産面積の最小化。LNSの部分問題用）。過剰生産の上限は置かない
+        self.window = window
+        # violations[i] = {"lower": (違反量, 違反の有無), "upper": (違反量, 違反の有無)}
+        self.violations = {}
+        self.violation_bound = 0
+        self.target_j = next((j for j, s in enumerate(slots) if s["is_target"]), None)
+        self.formulation = None
+        self.vars = {}
+        self.n = {}
+        # cut_terms[i, j] = [(k, var), ...]  ロールjのdemand iのカット本数 = Σ k * var
+        self.cut_terms = {}
+        self.objective = None
+
+    def hint(self, assignment):
+        # assignment[j] = (本数, demandごとのカット本数) → [(変数, 値), ...]
+        values = [(self.n[j], n) for j, (n, _) in assignment.items() if not self.slots[j]["is_target"]]
+        if self.formulation == "onehot":
+            x, q = self.vars["x"], self.vars["q"]
+            for (i, j, k), var in x.items():
+                n, cuts = assignment[j]
+                values.append((var, int(cuts[i] == k)))
+                if k and (i, j, k) in q and q[i, j, k] is not var:
+                    values.append((q[i, j, k], n * int(cuts[i] == k)))
+        else:
+            c, y, bits, r, u = (self.vars[key] for key in ("c", "y", "bits", "r", "u"))
+            for (i, j), var in c.items():
+                n, cuts = assignment[j]
+                values.append((var, cuts[i]))
+                values.append((y[i, j], int(cuts[i] > 0)))
+                for b, rb in enumerate(r.get((i, j), [])):
+                    bit = (n >> b) & 1
+                    values.append((rb, bit * cuts[i]))
+                    values.append((u[i, j][b], bit * int(cuts[i] > 0)))
+            for j, slot_bits in bits.items():
+                n, _ = assignment[j]
+                values.extend((bit, (n >> b) & 1) for b, bit in enumerate(slot_bits))
+        return values
+
+    def layout(self, j, value, demands=None):
+        layout = []
+        for i, d in enumerate(demands or self.demands):
+            cuts = sum(k * value(var) for k, var in self.cut_terms.get((i, j), []))
+            layout.extend([d["width"]] * int(round(cuts)))
+        layout.sort()
+        return layout
+
+
+def _add_slot_counts(solver, model):
+    slots = model.slots
+    for j, s in enumerate(slots):
+        if s["is_target"]:
+            model.n[j] = solver.IntVar(1, 1, f"n_{j}")
+        else:
+            model.n[j] = solver.IntVar(0, s["max_n"], f"n_{j}")
+    for key in sorted({s["class"] for s in slots}):
+        class_slots = [j for j, s in enumerate(slots) if s["class"] == key and not s["is_target"]]
+        if class_slots and model.window:
+            solver.Add(solver.Sum([model.n[j] for j in class_slots]) <= slots[class_slots[0]]["max_n"])
+        elif class_slots:
+            solver.Add(solver.Sum([model.n[j] for j in class_slots]) == slots[class_slots[0]]["max_n"])
+        for a, b in zip(class_slots, class_slots[1:]):
+            solver.Add(model.n[a] >= model.n[b])
+
+
+def _demand_bounds(solver, model, production):
+    demands = model.demands
+    for i, d in enumerate(demands):
+        total_production = solver.Sum(production[i])
+        min_excess = [math.ceil(d["length"] / s["length"]) * s["length"] for s in model.slots]
+        if not model.elastic:
+            solver.Add(total_production >= d["length"])
+            if not model.window:
+                solver.Add(total_production <= min(min_excess))
+            continue
+        # 1本に ceil(必要長さ/巻長) 本までしか切らないので、生産量はこれを超えない
+        most = sum(math.ceil(d["length"] / s["length"]) * s["length"] * s["max_n"] for s in model.slots)
+        model.violations[i] = {}
+        for kind, limit in (("lower", math.ceil(d["length"])), ("upper", most)):
+            amount = solver.IntVar(0, limit, f"{kind}_{i}")
+            violated = solver.IntVar(0, 1, f"{kind}_on_{i}")
+            solver.Add(amount <= limit * violated)
+            model.violations[i][kind] = (amount, violated)
+            model.violation_bound += limit
+        solver.Add(total_production + model.violations[i]["lower"][0] >= d["length"])
+        solver.Add(total_production - model.violations[i]["upper"][0] <= min(min_excess))
+
+
+def _set_elastic_objective(solver, model):
+    amounts = [amount for v in model.violations.values() for amount, _ in v.values()]
+    flags = [violated for v in model.violations.values() for _, violated in v.values()]
+    # 違反量の上限の合計より大きい重みを付けて、違反する制約の数を優先する
+    weight = 1 + model.violation_bound
+    model.objective = -(solver.Sum(flags) * weight + solver.Sum(amounts)) if flags else solver.Sum([])
+    solver.Maximize(model.objective)
+
+
+def _set_window_objective(solver, model, production, edge_loss, blade_width):
+    # 端材＋過剰生産面積 = 使ったロールの面積 - 刃幅の面積 - 必要面積（定数）。
+    # 定数も入れておくと、相対ギャップが（ロールの面積ではなく）端材＋過剰生産面積に対する比になる。
+    # 何も切らない枠に本数を割り当てると面積が増えるだけなので、使わないロールは本数0になる
+    area = [model.n[j] * ((s["width"] - edge_loss + blade_width) * s["length"]) for j, s in enumerate(model.slots)]
+    kerf = [term for terms in production for term in terms]
+    needed = sum(d["width"] * d["length"] for d in model.demands)
+    model.objective = -(solver.Sum(area) - solver.Sum(kerf) * blade_width - needed)
+    solver.Maximize(model.objective)
+
+
+def _set_objective(solver, model, used_width, other_remains, width_types, edge_loss, blade_width):
+    if model.elastic:
+        _set_elastic_objective(solver, model)
+        return
+    target = model.slots[model.target_j]
+    if model.demands:
+        target_remain = target["width"] - edge_loss + blade_width - solver.Sum(used_width)
+    else:
+        target_remain = target["width"] - edge_loss
+    objective_expr = [target_remain * 1000]
+    if other_remains:
+        objective_expr.append(-solver.Sum(other_remains) * 100)
+    if width_types:
+        objective_expr.append(-solver.Sum(width_types) * (10 * model.width_scale))
+    model.objective = solver.Sum(objective_expr)
+    solver.Maximize(model.objective)
+
+
+def build_onehot_model(solver, demands, slots, edge_loss, blade_width, width_scale=1, elastic=False, window=False):
+    # x[i,j,k] = ロールjにdemand iをk本配置（kごとの0/1変数）
+    model = CuttingModel(demands, slots, width_scale, elastic, window)
+    _add_slot_counts(solver, model)
+    num_demands = len(demands)
+    num_rolls = len(slots)
+    x = {}
+    q = {}
+    model.formulation = "onehot"
+    model.vars = {"x": x, "q": q}
+    max_cuts = cut_limits(demands, slots, edge_loss, blade_width)
+    for i in range(num_demands):
+        for j in range(num_rolls):
+            if max_cuts[i][j] <= 0:
+                continue
+            for k in range(0, max_cuts[i][j]+1):
+                x[i, j, k] = solver.IntVar(0, 1, f"x_{i}_{j}_{k}")
+            solver.Add(solver.Sum([x[i, j, k] for k in range(0, max_cuts[i][j]+1)]) <= 1)
+            model.cut_terms[i, j] = [(k, x[i, j, k]) for k in range(1, max_cuts[i][j]+1)]
+    # q[i,j,k] = n[j] * x[i,j,k]（このパターンを使うロール本数）
+    for i in range(num_demands):
+        for j in range(num_rolls):
+            m = slots[j]["max_n"]
+            for k in range(1, max_cuts[i][j]+1):
+                if slots[j]["is_target"]:
+                    q[i, j, k] = x[i, j, k]
+                    continue
+                q[i, j, k] = solver.IntVar(0, m, f"q_{i}_{j}_{k}")
+                solver.Add(q[i, j, k] <= m * x[i, j, k])
+                solver.Add(q[i, j, k] <= model.n[j])
+                solver.Add(q[i, j, k] >= model.n[j] - m * (1 - x[i, j, k]))
+    for j in range(num_rolls):
+        width_sum_expr = [x[i, j, k] * k * (demands[i]["width"] + blade_width)
+                          for i in range(num_demands) for k in range(1, max_cuts[i][j]+1)]
+        if width_sum_expr:
+            solver.Add(solver.Sum(width_sum_expr) <= slots[j]["width"] - edge_loss + blade_width)
+    production = [[q[i, j, k] * k * slots[j]["length"]
+                   for j in range(num_rolls) for k in range(1, max_cuts[i][j]+1)]
+                  for i in range(num_demands)]
+    _demand_bounds(solver, model, production)
+    if model.window:
+        _set_window_objective(solver, model, production, edge_loss, blade_width)
+        return model
+    # 各ロールで使用される幅の種類数（本数で重み付け）
+    width_types = [q[i, j, k] for j in range(num_rolls) for i in range(num_demands)
+                   for k in range(1, max_cuts[i][j]+1)]
+    t = model.target_j
+    used_width = [x[i, t, k] * k * (demands[i]["width"] + blade_width)
+                  for i in range(num_demands) for k in range(1, max_cuts[i][t]+1)]
+    other_remains = []
+    for j in range(num_rolls):
+        if j == t:
+            continue
+        width_expr = [q[i, j, k] * k * (demands[i]["width"] + blade_width)
+                      for i in range(num_demands) for k in range(1, max_cuts[i][j]+1)]
+        other_remains.append(model.n[j] * (slots[j]["width"] - edge_loss + blade_width) - solver.Sum(width_expr))
+    _set_objective(solver, model, used_width, other_remains, width_types, edge_loss, blade_width)
+    return model
+
+
+def build_compact_model(solver, demands, slots, edge_loss, blade_width, width_scale=1, elastic=False, window=False):
+    # c[i,j] = ロールjのdemand iのカット本数（容量と必要数で上限を絞った整数変数1つ）
+    model = CuttingModel(demands, slots, width_scale, elastic, window)
+    _add_slot_counts(solver, model)
+    num_demands = len(demands)
+    num_rolls = len(slots)
+    c = {}
+    y = {}
+    r = {}
+    u = {}
+    production = [[] for _ in range(num_demands)]
+    width_types = []
+    used_width = {j: [] for j in range(num_rolls)}
+    # 本数nの二進展開（n * c と n * y を線形化するため）
+    bits = {}
+    model.formulation = "compact"
+    model.vars = {"c": c, "y": y, "bits": bits, "r": r, "u": u}
+    max_cuts = cut_limits(demands, slots, edge_loss, blade_width)
+    for j, s in enumerate(slots):
+        if s["is_target"]:
+            continue
+        bits[j] = [solver.IntVar(0, 1, f"b_{j}_{b}") for b in range(s["max_n"].bit_length())]
+        solver.Add(model.n[j] == solver.Sum([bit * (1 << b) for b, bit in enumerate(bits[j])]))
+    for i, d in enumerate(demands):
+        for j, s in enumerate(slots):
+            max_k = max_cuts[i][j]
+            if max_k <= 0:
+                continue
+            c[i, j] = solver.IntVar(0, max_k, f"c_{i}_{j}")
+            y[i, j] = solver.IntVar(0, 1, f"y_{i}_{j}")
+            solver.Add(c[i, j] <= max_k * y[i, j])
+            solver.Add(y[i, j] <= c[i, j])
+            model.cut_terms[i, j] = [(1, c[i, j])]
+            used_width[j].append(c[i, j] * (d["width"] + blade_width))
+            if s["is_target"]:
+                production[i].append(c[i, j] * s["length"])
+                width_types.append(y[i, j])
+                continue
+            # r[i,j][b] = bit_b * c[i,j], u = bit_b * y[i,j]
+            r[i, j] = []
+            u[i, j] = []
+            for b, bit in enumerate(bits[j]):
+                rb = solver.IntVar(0, max_k, f"r_{i}_{j}_{b}")
+                solver.Add(rb <= max_k * bit)
+                solver.Add(rb <= c[i, j])
+                solver.Add(rb >= c[i, j] - max_k * (1 - bit))
+                ub = solver.IntVar(0, 1, f"u_{i}_{j}_{b}")
+                solver.Add(ub <= bit)
+                solver.Add(ub <= y[i, j])
+                solver.Add(ub >= bit + y[i, j] - 1)
+                r[i, j].append(rb)
+                u[i, j].append(ub)
+                production[i].append(rb * ((1 << b) * s["length"]))
+                width_types.append(ub * (1 << b))
+    for j, s in enumerate(slots):
+        if used_width[j]:
+            solver.Add(solver.Sum(used_width[j]) <= s["width"] - edge_loss + blade_width)
+    _demand_bounds(solver, model, production)
+    if model.window:
+        _set_window_objective(solver, model, production, edge_loss, blade_width)
+        return model
+    t = model.target_j
+    other_remains = []
+    for j, s in enumerate(slots):
+        if j == t:
+            continue
+        width_expr = [rb * ((1 << b) * (demands[i]["width"] + blade_width))
+                      for i in range(num_demands) if (i, j) in r
+                      for b, rb in enumerate(r[i, j])]
+        other_remains.append(model.n[j] * (s["width"] - edge_loss + blade_width) - solver.Sum(width_expr))
+    _set_objective(solver, model, used_width[t], other_remains, width_types, edge_loss, blade_width)
+    return model
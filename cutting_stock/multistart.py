@@ -0,0 +1,177 @@
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from math import ceil
+from multiprocessing import Manager
+
+from .colgen import bounded_knapsack
+from .greedy import assign_rolls_units, can_cut_any, repeat_count
+from .units import denormalize_rolls, normalize_instance
+
+DEFAULT_STARTS = 64
+DEFAULT_TIME_LIMIT = 10.0
+FITS = ("first", "best")
+# 1プロセスにまとめて渡すバリアント数（プロセス間通信を減らす）
+CHUNK = 8
+# 並列実行中にキャンセルを確認する間隔（秒）
+POLL_INTERVAL = 0.1
+
+
+def plan_score(rolls, demands, edge_loss, blade_width):
+    # (不足面積, 端材面積 + 過剰生産面積)。小さいほど良い（面積は幅×巻長）。同じ幅のdemandはまとめて数える。
+    # 端材は割付から計算し直す（貪欲法の remain は最後の刃幅も引いているため）
+    needed = {}
+    for d in demands:
+        needed[d["width"]] = needed.get(d["width"], 0) + d["length"]
+    produced = dict.fromkeys(needed, 0)
+    remnant = 0
+    for r in rolls:
+        if not r["layout"]:
+            continue
+        used = sum(r["layout"]) + blade_width * (len(r["layout"]) - 1)
+        remnant += (r["width"] - edge_loss - used) * r["length"] * r["count"]
+        for w in r["layout"]:
+            produced[w] += r["length"] * r["count"]
+    shortage = sum(max(needed[w] - produced[w], 0) * w for w in needed)
+    over = sum(max(produced[w] - needed[w], 0) * w for w in needed)
+    return shortage, remnant + over
+
+
+def _perturbed(items, rng, spread):
+    # 元の並びを保ちつつ、順位にノイズを加えて並べ替える
+    return [item for _, item in sorted(((idx + rng.gauss(0, spread), item) for idx, item in enumerate(items)),
+                                       key=lambda x: x[0])]
+
+
+def _best_fit(roll, widths, needed, order, edge_loss, blade_width):
+    # 残りの必要本数を上限にした有界ナップサックで、残り幅が最小のカットを選ぶ。
+    # 優先順の高いdemandほど小さなボーナスを足して同点を分ける（ボーナスの合計は幅1単位に満たない）
+    capacity = roll["width"] - edge_loss + blade_width
+    weights = [w + blade_width for w in widths]
+    tiny = 1.0 / ((capacity + 1) * (len(widths) + 1))
+    rank = {i: len(order) - r for r, i in enumerate(order)}
+    values = [wt + rank[i] * tiny for i, wt in enumerate(weights)]
+    return bounded_knapsack(capacity, weights, values, needed)
+
+
+def randomized_plan(demands, stock, edge_loss, blade_width, rng, fit="first", deadline=None, stop=None):
+    # assign_rolls の変種：ロール順・demand順を乱し、first-fit（優先順に詰める）か best-fit（残り幅最小）で割り付ける。
+    # 締切を過ぎるか stop がセットされたら途中でやめて None を返す
+    spread_rolls = rng.choice((0.0, 0.5, 2.0, len(stock) / 4 + 1))
+    spread_demands = rng.choice((0.0, 0.5, 1.0, len(demands) / 2 + 1))
+    rolls = _perturbed(sorted(stock, key=lambda x: (x["width"], x["length"])), rng, spread_rolls)
+    order = _perturbed(sorted(range(len(demands)), key=lambda i: -demands[i]["width"]), rng, spread_demands)
+    widths = tuple(d["width"] for d in demands)
+    needs = [d["length"] for d in demands]
+    results = []
+    for roll in rolls:
+        length = roll["length"]
+        left = roll["count"]
+        while left > 0:
+            if _stopped(deadline, stop):
+                return None
+            needed = [max(0, ceil(n / length)) for n in needs]
+            if fit == "best":
+                cuts = _best_fit(roll, widths, needed, order, edge_loss, blade_width)
+            else:
+                cuts = [0] * len(demands)
+                remain = roll["width"] - edge_loss + blade_width
+                for i in order:
+                    step = widths[i] + blade_width
+                    if needed[i] and 0 < step <= remain:
+                        cuts[i] = min(remain // step, needed[i])
+                        remain -= cuts[i] * step
+            repeat = repeat_count(left, [(needs[i], k) for i, k in enumerate(cuts) if k], length)
+            for i, k in enumerate(cuts):
+                needs[i] -= repeat * k * length
+            layout = sorted((widths[i] for i in order for _ in range(cuts[i])), reverse=True)
+            used = sum(layout) + blade_width * (len(layout) - 1) if layout else 0
+            results.append({
+                "width": roll["width"],
+                "length": roll["length"],
+                "count": repeat,
+                "cuts": len(layout),
+                "layout": layout,
+                "remain": roll["width"] - edge_loss - used
+            })
+            left -= repeat
+    return results
+
+
+def _variant_rng(seed, index):
+    return random.Random(seed * 1_000_003 + index)
+
+
+class _Cancelled:
+    # 同じプロセス内で実行するとき、control.cancelled を Event と同じ is_set() で見せる
+    def __init__(self, control):
+        self.control = control
+
+    def is_set(self):
+        return self.control.cancelled
+
+
+def _stopped(deadline, stop):
+    return (deadline is not None and time.time() > deadline) or (stop is not None and stop.is_set())
+
+
+def _run_variants(demands, stock, edge_loss, blade_width, seed, indices, deadline, stop=None):
+    # ワーカープロセス内で実行。戻り値: (スコア, バリアント番号, 結果)。
+    # 締切を過ぎるか stop がセットされたら、途中のバリアントは捨ててそれまでの最良を返す
+    best = None
+    for index in indices:
+        if index == 0:
+            rolls = assign_rolls_units(demands, stock, edge_loss, blade_width)
+        else:
+            rng = _variant_rng(seed, index)
+            rolls = randomized_plan(demands, stock, edge_loss, blade_width, rng, FITS[index % len(FITS)],
+                                    deadline, stop)
+            if rolls is None:
+                break
+        candidate = (plan_score(rolls, demands, edge_loss, blade_width), index, rolls)
+        if best is None or candidate[:2] < best[:2]:
+            best = candidate
+    return best
+
+
+def multistart_units(demands, stock, edge_loss, blade_width, starts=DEFAULT_STARTS, seed=0, workers=None,
+                     time_limit=DEFAULT_TIME_LIMIT, control=None):
+    # バリアント0は決定的な assign_rolls。残りを乱択し、最良の計画を返す。
+    # 同じ seed・starts で時間内に全バリアントが終われば結果は再現する。幅は units.to_units の整数。
+    # control がキャンセルされたら、それまでに終わったバリアントの最良を返す
+    if not can_cut_any(demands, stock, edge_loss, blade_width):
+        return []
+    deadline = time.time() + time_limit
+    chunks = [list(range(start, min(start + CHUNK, starts))) for start in range(0, starts, CHUNK)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        stop = _Cancelled(control) if control is not None else None
+        found = [_run_variants(demands, stock, edge_loss, blade_width, seed, chunk, deadline, stop)
+                 for chunk in chunks]
+    elif control is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_variants, demands, stock, edge_loss, blade_width, seed, chunk, deadline)
+                       for chunk in chunks]
+            found = [future.result() for future in futures]
+    else:
+        # ワーカープロセスには control を渡せないので、キャンセルを共有の Event で伝える
+        with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+            stop = manager.Event()
+            futures = [pool.submit(_run_variants, demands, stock, edge_loss, blade_width, seed, chunk, deadline,
+                                   stop)
+                       for chunk in chunks]
+            pending = set(futures)
+            while pending:
+                if control.cancelled:
+                    stop.set()
+                _, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            found = [future.result() for future in futures]
+    return min((f for f in found if f is not None), key=lambda f: f[:2])[2]
+
+
+def multistart(demands, stock, edge_loss, blade_width, starts=DEFAULT_STARTS, seed=0, workers=None,
+               time_limit=DEFAULT_TIME_LIMIT, control=None):
+    # mm単位の入出力
+    return denormalize_rolls(multistart_units(*normalize_instance(demands, stock, edge_loss, blade_width),
+                                              starts, seed, workers, time_limit, control))
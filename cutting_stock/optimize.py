@@ -0,0 +1,370 @@
+import math
+import time
+
+from .backends import FEASIBLE, INFEASIBLE, NOT_SOLVED, OPTIMAL, UNAVAILABLE, create_backend
+from .dp import DP_MAX_DEMANDS, TooLarge, exact_assignment
+from .model import build_compact_model, build_onehot_model, build_slots, integer_lengths, select_target
+from .presolve import merge_demands
+from .profiling import phase
+from .units import WIDTH_SCALE, denormalize_rolls, normalize_instance, normalize_rolls
+
+DEFAULT_TIME_LIMIT = 30.0
+# この相対ギャップ以内と証明できたら時間制限の前でも止める（簡単な問題はすぐ終わる）
+DEFAULT_RELATIVE_GAP = 0.01
+# 実行不可能の診断（弾性モデル）に使う時間の上限
+DIAGNOSIS_TIME_LIMIT = 10.0
+
+
+def _row(key, count, layout, edge_loss, blade_width):
+    used = sum(layout) + blade_width * len(layout) - blade_width if layout else 0
+    return {
+        "width": key[0],
+        "length": key[1],
+        "count": count,
+        "cuts": len(layout),
+        "layout": layout,
+        "remain": key[0] - edge_loss - used
+    }
+
+
+def _rebuild_results(results, roll_classes, slots, model, value, demands, edge_loss, blade_width):
+    target_j = model.target_j
+    class_rows = {key: [] for key in roll_classes}
+    target_row = None
+    for j, slot in enumerate(slots):
+        count = int(round(value(model.n[j])))
+        if count <= 0:
+            continue
+        layout = model.layout(j, value, demands)
+        rows = class_rows[slot["class"]]
+        same = [r for r in rows if r["layout"] == layout]
+        if j != target_j and same:
+            same[0]["count"] += count
+            continue
+        row = _row(slot["class"], count, layout, edge_loss, blade_width)
+        if j == target_j:
+            target_row = row
+        else:
+            rows.append(row)
+    # ターゲットロールはクラス内の先頭に置く
+    if target_row is not None:
+        class_rows[slots[target_j]["class"]].insert(0, target_row)
+    # 窓のモデルで使わなくなったロールは、クラス内の最後に未使用の行として残す
+    for key, rows in class_rows.items():
+        unused = roll_classes[key]["count"] - sum(r["count"] for r in rows)
+        if unused > 0:
+            rows.append(_row(key, unused, [], edge_loss, blade_width))
+    return _assemble_results(results, roll_classes, class_rows, edge_loss)
+
+
+def _assemble_results(results, roll_classes, class_rows, edge_loss):
+    # 集計に入れなかった行（未使用）はそのまま残し、集計したクラスは最初に現れた位置に新しい行をまとめて置く
+    new_results = []
+    for idx, r in enumerate(results):
+        key = (r["width"], r["length"])
+        if key not in roll_classes or idx not in roll_classes[key]["rows"]:
+            new_results.append({
+                "width": r["width"],
+                "length": r["length"],
+                "count": r["count"],
+                "cuts": 0,
+                "layout": [],
+                "remain": r["width"] - edge_loss
+            })
+            continue
+        if roll_classes[key]["first_idx"] == idx:
+            new_results.extend(class_rows[key])
+    return new_results
+
+
+def greedy_assignment(results, slots, target_index, demands):
+    # 貪欲法の割付を枠（本数, demandごとのカット本数）に対応付ける。demands は幅ごとにまとめたもの（merge_demands）
+    index = {d["width"]: i for i, d in enumerate(demands)}
+
+    def cuts_of(layout):
+        cuts = [0] * len(demands)
+        for w in layout:
+            cuts[index[w]] += 1
+        return cuts
+
+    # 同じ割付の行（貪欲法は同じ割付を何行にも分けて出す）は本数を合計して1つの枠にする
+    class_rows = {}
+    for idx, r in enumerate(results):
+        if not r["layout"]:
+            continue
+        count = r["count"] - (1 if idx == target_index else 0)
+        if count > 0:
+            layouts = class_rows.setdefault((r["width"], r["length"]), {})
+            layouts[tuple(r["layout"])] = layouts.get(tuple(r["layout"]), 0) + count
+    class_rows = {key: [(count, list(layout)) for layout, count in layouts.items()]
+                  for key, layouts in class_rows.items()}
+    assignment = {}
+    for j, slot in enumerate(slots):
+        if slot["is_target"]:
+            target = results[target_index]
+            assignment[j] = (1, cuts_of(target["layout"]))
+    for key, rows in class_rows.items():
+        class_slots = [j for j, s in enumerate(slots) if s["class"] == key and not s["is_target"]]
+        rows.sort(key=lambda row: row[0], reverse=True)
+        for j, (count, layout) in zip(class_slots, rows):
+            assignment[j] = (count, cuts_of(layout))
+    for j in range(len(slots)):
+        assignment.setdefault(j, (0, [0] * len(demands)))
+    # 貪欲法は1カット分多く作ることがあり、MIPの生産量の上限（1本で足りる巻長の倍数）を超えるとヒントが実行不可能になる。
+    # 必要長さを割らない範囲で、本数の少ない枠からカットを減らす
+    for i, d in enumerate(demands):
+        upper = min(math.ceil(d["length"] / s["length"]) * s["length"] for s in slots)
+        produced = sum(n * cuts[i] * slots[j]["length"] for j, (n, cuts) in assignment.items())
+        for j in sorted(assignment, key=lambda j: assignment[j][0] * slots[j]["length"]):
+            n, cuts = assignment[j]
+            while n and cuts[i] and produced > upper and produced - n * slots[j]["length"] >= d["length"]:
+                cuts[i] -= 1
+                produced -= n * slots[j]["length"]
+    return assignment
+
+
+class ConvertingControl:
+    # 暫定解の計画を convert で変換してから control に渡す（単位の変換や presolve の復元）。キャンセルはそのまま中継する
+    def __init__(self, control, convert):
+        self.control = control
+        self.convert = convert
+
+    @property
+    def cancelled(self):
+        return self.control.cancelled
+
+    def attach(self, solver):
+        self.control.attach(solver)
+
+    def reserve(self, threads):
+        return self.control.reserve(threads)
+
+    def incumbent(self, objective, bound, rolls=None):
+        self.control.incumbent(objective, bound, None if rolls is None else self.convert(rolls))
+
+
+def _incumbent_reporter(control, width_scale, results, roll_classes, slots, model, demands, edge_loss, blade_width):
+    # 改善解の変数の値が取れるバックエンド（CP-SAT）では、その時点の計画も組み立てて通知する
+    def report(objective, bound, value=None):
+        rolls = None
+        if value is not None:
+            rolls = _rebuild_results(results, roll_classes, slots, model, value, demands, edge_loss, blade_width)
+        control.incumbent(objective / width_scale, bound / width_scale, rolls)
+    return report
+
+
+def solve_last_roll(results, edge_loss, blade_width, demands, formulation="compact", backend="SCIP",
+                    threads=None, time_limit=DEFAULT_TIME_LIMIT, warm_start=True, control=None,
+                    relative_gap=DEFAULT_RELATIVE_GAP):
+    # mm単位の入出力。計算は solve_last_roll_units（0.1mm単位の整数）で行う
+    demands, _, edge_loss, blade_width = normalize_instance(demands, [], edge_loss, blade_width)
+    if control is not None:
+        control = ConvertingControl(control, denormalize_rolls)
+    new_results, report = solve_last_roll_units(normalize_rolls(results), edge_loss, blade_width, demands,
+                                                formulation, backend, threads, time_limit, warm_start, control,
+                                                relative_gap)
+    return (None if new_results is None else denormalize_rolls(new_results)), report
+
+
+def solve_last_roll_units(results, edge_loss, blade_width, demands, formulation="compact", backend="SCIP",
+                          threads=None, time_limit=DEFAULT_TIME_LIMIT, warm_start=True, control=None,
+                          relative_gap=DEFAULT_RELATIVE_GAP):
+    # 幅は units.to_units の整数。MIPの幅の係数はすべて整数になる
+    # 戻り値: (再配置後の結果 or None, ソルバー実行レポート)。再配置の対象がなければ (None, None)
+    # control: attach(solver) でキャンセル用にソルバーを受け取り、incumbent(目的関数値, 上界, 計画) で暫定解の通知を受ける
+    # （計画は results と同じ形式。改善解の値が取れないバックエンドでは None）
+    # relative_gap: 相対ギャップがこれ以下と証明できたら止める（None なら時間制限まで最適性の証明を続ける）
+    # 同じ幅の行はまとめてから解く（まとめないとモデルが同じ幅のカットをどの行に数えるかで揺れ、ヒントも壊れる）
+    used_count = sum(r["count"] for r in results if r["layout"])
+    target_index = select_target(results)
+    if used_count < 2 or target_index == -1:
+        return None, None
+    return _solve_slots(results, target_index, edge_loss, blade_width, demands, formulation, backend, threads,
+                        time_limit, warm_start, control, relative_gap)
+
+
+def solve_window_units(results, edge_loss, blade_width, demands, formulation="compact", backend="SCIP",
+                       threads=None, time_limit=DEFAULT_TIME_LIMIT, warm_start=True, control=None,
+                       relative_gap=DEFAULT_RELATIVE_GAP):
+    # LNSの部分問題：results のロール（未使用の行も使える）で demands を満たし、端材＋過剰生産面積
+    # （multistart.plan_score と同じ評価）を最小にする割付。ターゲットはなく、使わないロールは未使用の行になる。
+    # 幅は units.to_units の整数
+    # 戻り値は solve_last_roll_units と同じ（使用中のロールがなければ (None, None)）
+    if not any(r["layout"] for r in results):
+        return None, None
+    return _solve_slots(results, None, edge_loss, blade_width, demands, formulation, backend, threads, time_limit,
+                        warm_start, control, relative_gap)
+
+
+def _solve_slots(results, target_index, edge_loss, blade_width, demands, formulation, backend, threads, time_limit,
+                 warm_start, control, relative_gap):
+    # target_index が None なら窓のモデル（model.CuttingModel の window）で解く
+    demands = merge_demands(demands)
+    window = target_index is None
+    roll_classes, slots = build_slots(results, target_index, include_unused=window)
+    solver = create_backend(backend, threads)
+    if not solver.available:
+        return None, {"backend": backend, "status": UNAVAILABLE, "wall_time": 0.0, "threads": solver.threads,
+                      "objective": None, "bound": None, "gap": None}
+    build_model = build_compact_model if formulation == "compact" else build_onehot_model
+    width_scale = WIDTH_SCALE
+    with phase("build_model") as entry:
+        if solver.integer_only:
+            model = build_model(solver, *integer_lengths(demands, slots), edge_loss, blade_width, width_scale,
+                                window=window)
+        else:
+            model = build_model(solver, demands, slots, edge_loss, blade_width, width_scale, window=window)
+        if warm_start:
+            solver.set_hint(model.hint(greedy_assignment(results, slots, target_index, demands)))
+        if entry is not None:
+            entry.update(solver.model_size())
+    on_incumbent = None
+    if control is not None:
+        control.attach(solver)
+        if control.cancelled:
+            return None, {"backend": backend, "status": NOT_SOLVED, "wall_time": 0.0, "threads": solver.threads,
+                          "objective": None, "bound": None, "gap": None, "warm_start": warm_start}
+        on_incumbent = _incumbent_reporter(control, width_scale, results, roll_classes, slots, model, demands,
+                                           edge_loss, blade_width)
+    with phase("solve") as entry:
+        report = solver.solve(time_limit, on_incumbent, relative_gap)
+        if entry is not None:
+            entry.update(backend=report["backend"], threads=report["threads"], status=report["status"])
+    report["warm_start"] = warm_start
+    for key in ("objective", "bound"):
+        if report[key] is not None:
+            report[key] /= width_scale
+    if report["status"] not in (OPTIMAL, FEASIBLE):
+        return None, report
+    with phase("rebuild"):
+        new_results = _rebuild_results(results, roll_classes, slots, model, solver.value, demands, edge_loss,
+                                       blade_width)
+    return new_results, report
+
+
+def diagnose_last_roll_units(results, edge_loss, blade_width, demands, backend="SCIP", threads=None,
+                             time_limit=DIAGNOSIS_TIME_LIMIT, control=None):
+    # 再配置のモデルが実行不可能なとき、必要長さ（下限）と過剰生産の上限のうち、違反させる必要がある制約の
+    # 最小の組を弾性モデル（違反量の変数付き）で求める。幅は units.to_units の整数
+    # 戻り値: {"status": 弾性モデルの状態, "conflicts": [{"demand", "width", "length", "bound", "limit", "amount"}]}
+    # bound は "lower"（必要長さに amount 届かない）か "upper"（上限 limit を amount 超える）。解けなければ None
+    demands = merge_demands(demands)
+    target_index = select_target(results)
+    if target_index == -1:
+        return None
+    _, slots = build_slots(results, target_index)
+    solver = create_backend(backend, threads)
+    if not solver.available:
+        return None
+    int_demands, int_slots = integer_lengths(demands, slots)
+    length_scale = int_slots[0]["length"] / slots[0]["length"]
+    model = build_compact_model(solver, int_demands, int_slots, edge_loss, blade_width, WIDTH_SCALE, elastic=True)
+    if control is not None:
+        control.attach(solver)
+        if control.cancelled:
+            return None
+    report = solver.solve(time_limit)
+    if report["status"] not in (OPTIMAL, FEASIBLE):
+        return None
+    conflicts = []
+    for i, violations in model.violations.items():
+        d = demands[i]
+        for bound, (amount, violated) in violations.items():
+            if round(solver.value(violated)) and solver.value(amount) > 0:
+                limit = d["length"] if bound == "lower" else min(math.ceil(d["length"] / s["length"]) * s["length"]
+                                                                   for s in slots)
+                conflicts.append({"demand": i, "width": d["width"], "length": d["length"], "bound": bound,
+                                  "limit": limit, "amount": solver.value(amount) / length_scale})
+    return {"status": report["status"], "conflicts": conflicts}
+
+
+def solve_last_roll_dp_units(results, edge_loss, blade_width, demands, control=None, time_limit=None):
+    # solve_last_roll_units と同じ問題を dp.exact_assignment で厳密に解く（ソルバー不要）。幅は units.to_units の整数
+    # 戻り値は solve_last_roll_units と同じ。ただし規模が大きすぎる・time_limit を過ぎた・キャンセルされたときは None
+    demands = merge_demands(demands)
+    used_count = sum(r["count"] for r in results if r["layout"])
+    target_index = select_target(results)
+    if used_count < 2 or target_index == -1:
+        return None, None
+    start = time.perf_counter()
+    deadline = None if time_limit is None else start + time_limit
+    roll_classes, _ = build_slots(results, target_index)
+    target_key = (results[target_index]["width"], results[target_index]["length"])
+    keys = sorted(roll_classes)
+    int_demands, int_slots = integer_lengths(demands, [{"length": key[1]} for key in keys])
+    int_keys = {key: (key[0], slot["length"]) for key, slot in zip(keys, int_slots)}
+    classes = {int_keys[key]: roll_classes[key]["count"] - (1 if key == target_key else 0) for key in keys}
+    try:
+        solved = exact_assignment(int_demands, int_keys[target_key], {k: m for k, m in classes.items() if m > 0},
+                                  edge_loss, blade_width, WIDTH_SCALE, deadline=deadline, control=control)
+    except TooLarge:
+        return None
+    report = {"backend": "DP", "status": INFEASIBLE if solved is None else OPTIMAL,
+              "wall_time": time.perf_counter() - start, "threads": 1, "objective": None, "bound": None,
+              "gap": None, "warm_start": False}
+    if solved is None:
+        return None, report
+    objective, target_cuts, counts = solved
+    report.update(objective=objective / WIDTH_SCALE, bound=objective / WIDTH_SCALE, gap=0.0)
+
+    def layout_of(cuts):
+        return sorted(d["width"] for d, k in zip(demands, cuts) for _ in range(k))
+
+    class_rows = {}
+    for key in keys:
+        patterns = counts.get(int_keys[key], {})
+        class_rows[key] = [_row(key, count, layout_of(cuts), edge_loss, blade_width)
+                           for cuts, count in sorted(patterns.items(), key=lambda item: (-item[1], item[0]))]
+    # ターゲットロールはクラス内の先頭に置く
+    class_rows[target_key].insert(0, _row(target_key, 1, layout_of(target_cuts), edge_loss, blade_width))
+    new_results = _assemble_results(results, roll_classes, class_rows, edge_loss)
+    if control is not None:
+        control.incumbent(report["objective"], report["bound"], new_results)
+    return new_results, report
+
+
+def solve_last_roll_dp(results, edge_loss, blade_width, demands, control=None, time_limit=None):
+    # mm単位の入出力
+    demands, _, edge_loss, blade_width = normalize_instance(demands, [], edge_loss, blade_width)
+    if control is not None:
+        control = ConvertingControl(control, denormalize_rolls)
+    solved = solve_last_roll_dp_units(normalize_rolls(results), edge_loss, blade_width, demands, control, time_limit)
+    if solved is None:
+        return None
+    new_results, report = solved
+    return (None if new_results is None else denormalize_rolls(new_results)), report
+
+
+def optimize_last_roll_units(results, edge_loss, blade_width, demands, formulation="compact", backend="SCIP",
+                             threads=None, time_limit=DEFAULT_TIME_LIMIT, warm_start=True, control=None,
+                             relative_gap=DEFAULT_RELATIVE_GAP):
+    # 規模で解法を選ぶ：demandが少なく動的計画法の割付の列挙数・遷移数が上限に収まれば厳密解（モデル構築・
+    # ソルバー起動を省く）、それ以外は solve_last_roll_units のMIP（動的計画法に使った時間は time_limit から引く）。
+    # control があれば、MIPに回すときにMIPのスレッド数を予約し直す（動的計画法は1スレッドで足りるため）。
+    # 戻り値は solve_last_roll_units と同じ
+    demands = merge_demands(demands)
+    if len(demands) <= DP_MAX_DEMANDS and not (control is not None and control.cancelled):
+        start = time.perf_counter()
+        with phase("dp"):
+            solved = solve_last_roll_dp_units(results, edge_loss, blade_width, demands, control, time_limit)
+        if solved is not None:
+            return solved
+        time_limit = max(time_limit - (time.perf_counter() - start), 0.01)
+    if control is not None and threads:
+        with phase("queue"):
+            threads = control.reserve(threads)
+    return solve_last_roll_units(results, edge_loss, blade_width, demands, formulation, backend, threads, time_limit,
+                                 warm_start, control, relative_gap)
+
+
+def optimize_last_roll(results, edge_loss, blade_width, demands, formulation="compact", backend="SCIP",
+                       threads=None, time_limit=DEFAULT_TIME_LIMIT, warm_start=True, control=None,
+                       relative_gap=DEFAULT_RELATIVE_GAP):
+    # mm単位の入出力
+    demands, _, edge_loss, blade_width = normalize_instance(demands, [], edge_loss, blade_width)
+    if control is not None:
+        control = ConvertingControl(control, denormalize_rolls)
+    new_results, report = optimize_last_roll_units(normalize_rolls(results), edge_loss, blade_width, demands,
+                                                   formulation, backend, threads, time_limit, warm_start, control,
+                                                   relative_gap)
+    return (None if new_results is None else denormalize_rolls(new_results)), report
@@ -0,0 +1,46 @@
+from functools import lru_cache
+
+# 1つのロール幅について列挙するパターン数の上限（幅の狭いdemandが多いと組合せが爆発するため）
+PATTERN_LIMIT = 2000
+
+
+@lru_cache(maxsize=256)
+def roll_patterns(roll_width, demand_widths, edge_loss, blade_width, limit=PATTERN_LIMIT):
+    # ロール1本に入る非支配の割付パターン（どのdemandももう1本は入らない本数ベクトル）を、最大 limit 個まで列挙する。
+    # 幅は units.to_units の整数、demand_widths はタプル。巻長に依らないので、同じ幅のロールクラス間で共有される
+    # 戻り値: demand_widths と同じ並びの本数タプルのタプル（幅の広いdemandを多く使うものから）
+    capacity = roll_width - edge_loss + blade_width
+    steps = [w + blade_width for w in demand_widths]
+    if capacity <= 0 or not steps or min(steps) <= 0:
+        return ()
+    # 幅の広い順に本数を決める深さ優先探索（本数の多い方から）。最後（最も狭い幅）は入るだけ入れれば残り幅が
+    # 最小の幅未満になるので、途中の選び方はすべてちょうど1つのパターンになり、行き止まりの枝はない。
+    # 部分的な結果は保持せず、上限に達したらすぐやめる（demand数に比例する作業量とメモリで1個ずつ作る）
+    order = sorted(range(len(steps)), key=lambda i: steps[i], reverse=True)
+    ordered = [steps[i] for i in order]
+    counts = [0] * len(order)
+    remains = [capacity] + [0] * len(order)
+
+    def fill(start):
+        for pos in range(start, len(order)):
+            counts[pos] = remains[pos] // ordered[pos]
+            remains[pos + 1] = remains[pos] - counts[pos] * ordered[pos]
+
+    patterns = []
+    fill(0)
+    while len(patterns) < limit:
+        pattern = [0] * len(steps)
+        for i, k in zip(order, counts):
+            pattern[i] = k
+        patterns.append(tuple(pattern))
+        # 最後以外で本数を1本減らせる一番深い位置から、後ろを入るだけ詰め直す
+        pos = len(order) - 2
+        while pos >= 0 and counts[pos] == 0:
+            pos -= 1
+        if pos < 0:
+            break
+        counts[pos] -= 1
+        remains[pos + 1] += ordered[pos]
+        fill(pos + 1)
+    return tuple(patterns)
+
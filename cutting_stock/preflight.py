@@ -0,0 +1,75 @@
+from math import ceil
+
+from .units import WIDTH_SCALE, from_units
+
+
+def _capacity(roll, edge_loss, blade_width):
+    # MIPと同じ容量（最後のカットの刃幅は不要）。どのエンジンの割付もこの中に収まる
+    return roll["width"] - edge_loss + blade_width
+
+
+def max_lengths(widths, stock, edge_loss, blade_width):
+    # 幅ごとに、在庫をすべてその幅だけに使ったときの最大生産長さ
+    return {w: sum(s["count"] * (_capacity(s, edge_loss, blade_width) // (w + blade_width)) * s["length"]
+                   for s in stock)
+            for w in widths}
+
+
+def preflight(lines, stock, edge_loss, blade_width):
+    # 割付の前に数ミリ秒で分かる上下界。幅は units.to_units の整数、lines は元の行（同じ幅があってもよい）
+    # - deficits: 在庫をすべて使っても必要長さ（同じ幅の行の合計）に届かない幅。行の並びによらない
+    #   （キャッシュした結果を並びの違う入力にも返すため）。行への対応付けは line_deficits
+    # - area_shortfall: 幅の広いdemandから順に、それが入るロールの面積（幅×巻長）の合計と必要面積を比べた最大の不足
+    # - rolls_lower_bound: 上の面積の条件を満たすのに必要なロール本数の下限（LP緩和：面積の大きいロールから使う）
+    # 不足があれば、どのエンジンでも全demandは満たせない（MIPは実行不可能になる）
+    needed = {}
+    for line in lines:
+        needed[line["width"]] = needed.get(line["width"], 0) + line["length"]
+    possible = max_lengths(needed, stock, edge_loss, blade_width)
+    deficits = [{"width": w, "length": needed[w], "deficit": needed[w] - possible[w]}
+                for w in sorted(needed) if possible[w] < needed[w]]
+
+    area_shortfall = 0
+    rolls_lower_bound = 0
+    demand_area = 0
+    for w in sorted(needed, reverse=True):
+        step = w + blade_width
+        demand_area += needed[w] * step
+        fitting = sorted((s for s in stock if _capacity(s, edge_loss, blade_width) >= step),
+                         key=lambda s: _capacity(s, edge_loss, blade_width) * s["length"], reverse=True)
+        covered = 0
+        rolls = 0
+        for s in fitting:
+            area = _capacity(s, edge_loss, blade_width) * s["length"]
+            take = min(s["count"], ceil((demand_area - covered) / area))
+            covered += take * area
+            rolls += take
+            if covered >= demand_area:
+                break
+        area_shortfall = max(area_shortfall, demand_area - covered)
+        rolls_lower_bound = max(rolls_lower_bound, rolls)
+    feasible = not deficits and area_shortfall <= 0
+    return {"feasible": feasible, "deficits": deficits, "area_shortfall": area_shortfall,
+            "rolls_lower_bound": rolls_lower_bound if feasible else None}
+
+
+def line_deficits(deficits, lines):
+    # 幅ごとの不足（preflight の deficits）を元の行に割り当てる。同じ幅の最大生産長さは行の順に割り当てる
+    # 戻り値: [{"line": 行番号（0始まり）, "width", "length", "deficit"}]
+    possible = {d["width"]: d["length"] - d["deficit"] for d in deficits}
+    found = []
+    for i, line in enumerate(lines):
+        if line["width"] not in possible:
+            continue
+        done = min(possible[line["width"]], line["length"])
+        possible[line["width"]] -= done
+        if done < line["length"]:
+            found.append({"line": i, "width": line["width"], "length": line["length"],
+                          "deficit": line["length"] - done})
+    return found
+
+
+def denormalize_preflight(check):
+    # mm単位（不足面積は mm×M）に戻す
+    return dict(check, deficits=[dict(d, width=from_units(d["width"])) for d in check["deficits"]],
+                area_shortfall=check["area_shortfall"] / WIDTH_SCALE)
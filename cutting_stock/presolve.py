@@ -0,0 +1,35 @@
+from .stock import aggregate_stock
+
+
+def merge_demands(demands):
+    # 同じ幅の行を1つのdemandにまとめる（必要長さは合計、並びは最初に現れた順）
+    merged = {}
+    for d in demands:
+        if d["width"] in merged:
+            merged[d["width"]]["length"] += d["length"]
+        else:
+            merged[d["width"]] = {"width": d["width"], "length": d["length"]}
+    return list(merged.values())
+
+
+def presolve(demands, stock, edge_loss, blade_width):
+    # 割付の前に問題を縮める。幅は units.to_units の整数
+    # - 同じ幅のdemandをまとめる
+    # - どのロールにも入らないdemandは生産量0に確定なので外す（不足は元の行で判定する）
+    # - 同じ幅・巻長のロールクラスをまとめ、どのdemandも入らないロールクラスを外す
+    # 戻り値: (demands, stock, 外したロールクラス)
+    merged = merge_demands(demands)
+    classes = aggregate_stock(stock)
+    fits = [d for d in merged if any(s["width"] - edge_loss >= d["width"] + blade_width for s in classes)]
+    kept = [s for s in classes if any(s["width"] - edge_loss >= d["width"] + blade_width for d in fits)]
+    dropped = [s for s in classes if s not in kept]
+    return fits, kept, dropped
+
+
+def postsolve(rolls, dropped, edge_loss):
+    # 外したロールクラスを未使用の行として戻す（残したどのロールクラスより狭いので、幅順の並びでは先頭に来る）
+    if not rolls:
+        return rolls
+    unused = [{"width": s["width"], "length": s["length"], "count": s["count"], "cuts": 0, "layout": [],
+               "remain": s["width"] - edge_loss} for s in dropped]
+    return unused + rolls
@@ -0,0 +1,131 @@
+import contextvars
+import cProfile
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# cProfile の出力に残す関数の数（累積時間の上位）
+PROFILE_TOP = 40
+
+_recorder = contextvars.ContextVar("cutting_stock_phases", default=None)
+
+
+def peak_rss_mb():
+    # プロセスの起動からの最大常駐メモリ（MB）。段階ごとの値ではない。resource がない環境（Windows）では None
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class PhaseRecorder:
+    # 処理の段階ごとに実時間・CPU時間（プロセス全体、ソルバーのスレッドも含む）・その時点のプロセスの最大常駐メモリを
+    # 記録する。trace_memory なら段階の中で増えたPythonのメモリ割り当ての最大（tracemalloc、ソルバー内部の
+    # メモリは含まない。同じプロセスの他のスレッドの割り当ても数えるので、同時に解くジョブがあると目安）も
+    # memory_mb に記録する。
+    # 入れ子の段階は depth で表す。段階の記録に任意の項目（モデルの規模など）を足せる
+    def __init__(self, trace_memory=False):
+        self.phases = []
+        self.trace_memory = trace_memory
+        self._depth = 0
+        # 外側の段階ごとの、内側の段階が reset_peak する前までの割り当ての最大
+        self._peaks = []
+
+    @contextmanager
+    def phase(self, name):
+        entry = {"phase": name, "depth": self._depth}
+        self.phases.append(entry)
+        self._depth += 1
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(current)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield entry
+        finally:
+            self._depth -= 1
+            entry.update(wall_time=time.perf_counter() - wall, cpu_time=time.process_time() - cpu,
+                         peak_rss_mb=peak_rss_mb())
+            # 同時に記録していた別のジョブが tracemalloc を止めていたら、この段階の値は記録しない
+            if tracing and tracemalloc.is_tracing():
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                entry["memory_mb"] = (peak - current) / (1024 * 1024)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            elif tracing:
+                self._peaks.pop()
+
+
+def summarize(phases):
+    # 同じ名前の段階（LNSの部分問題など）をまとめる。並びは最初に現れた順
+    summary = {}
+    for entry in phases:
+        row = summary.setdefault(entry["phase"], {"phase": entry["phase"], "depth": entry["depth"], "calls": 0,
+                                                  "wall_time": 0.0, "cpu_time": 0.0, "peak_rss_mb": None})
+        row["calls"] += 1
+        row["wall_time"] += entry["wall_time"]
+        row["cpu_time"] += entry["cpu_time"]
+        if entry["peak_rss_mb"] is not None:
+            row["peak_rss_mb"] = max(row["peak_rss_mb"] or 0, entry["peak_rss_mb"])
+        for key in ("memory_mb", "variables", "constraints", "nonzeros"):
+            if key in entry:
+                row[key] = max(row.get(key, 0), entry[key])
+    return list(summary.values())
+
+
+@contextmanager
+def recording(recorder=None):
+    # このスレッド（コンテキスト）で実行する phase() を recorder に記録する。
+    # recorder.trace_memory なら、記録の間だけ tracemalloc を動かす（既に動いていればそのまま使う）
+    recorder = recorder or PhaseRecorder()
+    started = recorder.trace_memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+        if started:
+            tracemalloc.stop()
+
+
+@contextmanager
+def phase(name):
+    # 記録中なら段階の dict（項目を足せる）、記録中でなければ None を返す
+    recorder = _recorder.get()
+    if recorder is None:
+        yield None
+        return
+    with recorder.phase(name) as entry:
+        yield entry
+
+
+@contextmanager
+def profiled(enabled=True):
+    # cProfile で実行中のスレッドを計測し、累積時間の上位を文字列で返す（ワーカープロセスやソルバー内部は含まない）
+    capture = {"text": None}
+    if not enabled:
+        yield capture
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield capture
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        capture["text"] = out.getvalue()
@@ -0,0 +1,10 @@
+def aggregate_stock(rows):
+    # 同一の幅・巻長のロールを1つのロールクラス（本数付き）にまとめる
+    counts = {}
+    for r in rows:
+        count = int(r.get("count", 1))
+        if count <= 0:
+            continue
+        key = (r["width"], r["length"])
+        counts[key] = counts.get(key, 0) + count
+    return [{"width": w, "length": l, "count": c} for (w, l), c in sorted(counts.items())]
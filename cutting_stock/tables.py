@@ -0,0 +1,70 @@
+import pandas as pd
+
+DEMAND_COLUMNS = ["width", "length"]
+STOCK_COLUMNS = ["width", "length", "count"]
+# アップロードされた表の見出し（日本語・ベトナム語）を内部の列名に対応付ける
+COLUMN_ALIASES = {
+    "幅": "width", "カット幅": "width", "ロール幅": "width", "chiều rộng": "width", "chiều rộng cắt": "width",
+    "chiều rộng cuộn": "width",
+    "長さ": "length", "必要長さ": "length", "巻長": "length", "ロール巻長": "length", "chiều dài": "length",
+    "chiều dài cần thiết": "length", "chiều dài cuộn": "length",
+    "本数": "count", "ロール本数": "count", "số lượng": "count", "số lượng cuộn": "count", "số cuộn": "count",
+}
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def read_table(file, name, columns):
+    # CSV / Excel を読み、見出しを内部の列名にそろえる。列名が一致しなければ先頭から順に割り当てる
+    if name.lower().endswith((".xlsx", ".xls")):
+        try:
+            df = pd.read_excel(file)
+        except ImportError as e:
+            raise ValueError("Excel files need the openpyxl package") from e
+    else:
+        df = pd.read_csv(file, encoding="utf-8-sig")
+        if all(_is_number(c) for c in df.columns):
+            # 見出し行のないCSV
+            file.seek(0)
+            df = pd.read_csv(file, encoding="utf-8-sig", header=None)
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip().lower()))
+    if not set(columns) <= set(df.columns):
+        if len(df.columns) < len(columns) - (1 if "count" in columns else 0):
+            raise ValueError(f"{name}: expected columns {', '.join(columns)}")
+        df = df.iloc[:, :len(columns)]
+        df.columns = columns[:len(df.columns)]
+    return df.reindex(columns=columns)
+
+
+def clean_table(df, columns):
+    # 数値化して検証する。戻り値: (有効な行のDataFrame, 無効な行番号（1始まり）のリスト)
+    values = df.reindex(columns=columns).apply(pd.to_numeric, errors="coerce").astype(float)
+    values = values[values.notna().any(axis=1)]
+    if "count" in columns:
+        values["count"] = values["count"].fillna(1)
+    valid = values.notna().all(axis=1) & (values[["width", "length"]] > 0).all(axis=1)
+    if "count" in columns:
+        # 本数は整数のみ（2.5 などを切り捨てて使わない）
+        valid &= (values["count"] >= 0) & (values["count"] % 1 == 0)
+    invalid = [int(i) + 1 for i in values.index[~valid]]
+    return values[valid].reset_index(drop=True), invalid
+
+
+def demand_records(df):
+    df, invalid = clean_table(df, DEMAND_COLUMNS)
+    return df.to_dict("records"), invalid
+
+
+def stock_records(df):
+    # aggregate_stock と同じロールクラス（幅・巻長ごとの本数）をgroupbyでまとめる
+    df, invalid = clean_table(df, STOCK_COLUMNS)
+    df["count"] = df["count"].astype(int)
+    df = df[df["count"] > 0]
+    classes = df.groupby(["width", "length"], as_index=False, sort=True)["count"].sum()
+    return classes.to_dict("records"), invalid
@@ -0,0 +1,27 @@
+# 幅（材料幅・カット幅・両端ロス・刃幅）の固定小数点表現。内部では0.1mm単位の整数で扱い、
+# 入力時に変換して出力時に戻す。巻長・必要長さ（M）は変換しない
+WIDTH_SCALE = 10
+
+
+def to_units(mm):
+    return int(round(float(mm) * WIDTH_SCALE))
+
+
+def from_units(units):
+    return units / WIDTH_SCALE
+
+
+def normalize_instance(demands, stock, edge_loss, blade_width):
+    return ([dict(d, width=to_units(d["width"])) for d in demands],
+            [dict(s, width=to_units(s["width"])) for s in stock],
+            to_units(edge_loss), to_units(blade_width))
+
+
+def normalize_rolls(rolls):
+    return [dict(r, width=to_units(r["width"]), layout=[to_units(w) for w in r["layout"]],
+                 remain=to_units(r["remain"])) for r in rolls]
+
+
+def denormalize_rolls(rolls):
+    return [dict(r, width=from_units(r["width"]), layout=[from_units(w) for w in r["layout"]],
+                 remain=from_units(r["remain"])) for r in rolls]
@@ -1,8 +1,17 @@
 import streamlit as st
 import pandas as pd
+import json
 import locale
-import copy
-from math import ceil
+import os
+import time
+from cutting_stock import SolveCache
+from cutting_stock.engine import ENGINES, NO_FIT, QUEUE_CANCELLED, SHORTAGE, SOLVER_CANCELLED, SOLVER_ERROR, SOLVER_FAILED, SOLVER_SKIPPED, SOLVER_UNAVAILABLE, is_reusable, solve_key
+from cutting_stock.jobs import SolveJob
+from cutting_stock.tables import DEMAND_COLUMNS, STOCK_COLUMNS, demand_records, read_table, stock_records
+from cutting_stock.model import FORMULATIONS
+from cutting_stock.optimize import DEFAULT_RELATIVE_GAP, DEFAULT_TIME_LIMIT
+from cutting_stock.profiling import PhaseRecorder, summarize
+from cutting_stock.backends import BACKENDS, ORTOOLS_AVAILABLE, SINGLE_THREADED, default_threads, solver_threads
 locale.setlocale(locale.LC_ALL, '')
 
 st.set_page_config(page_title="Cutting Stock Optimizer", layout="wide")
@@ -17,21 +26,54 @@ TEXT = {
         "edge_loss": "両端ロス (mm)",
         "blade_width": "刃幅 (mm)",
         "demand_input": "作業指示の入力",
-        "demand_count": "作業指示数",
         "cut_width": "カット幅",
         "cut_length": "必要長さ (M)",
         "stock_input": "材料ストックの入力",
-        "stock_count": "材料ロール数",
         "roll_width": "ロール幅 (mm)",
         "roll_length": "ロール巻長 (M)",
         "roll_quantity": "ロール本数",
+        "upload": "CSV / Excelから読み込む",
+        "upload_error": "ファイルを読み込めませんでした",
+        "invalid_rows": "数値でない、または0以下の行は除外しました（行: {rows}）",
         "exec": "最適化実行",
         "result": "結果出力",
         "feedback": "作業指示へのフィードバック",
         "no_leftover": "端数なく最適化されています。",
         "leftover_msg": "以下のサイズについて端材があります：",
         "download": "結果CSVダウンロード",
-        "use_advanced": "高度な再配置ロジックを使用する"
+        "profile": "実行全体をcProfileで、段階ごとのメモリ割り当てをtracemallocで計測する（遅くなります）",
+        "performance": "パフォーマンス",
+        "render_time": "表の作成: {wall_time:.3f}秒",
+        "download_timings": "計測結果JSONダウンロード",
+        "use_advanced": "高度な再配置ロジックを使用する",
+        "engine": "最適化エンジン",
+        "engine_standard": "標準（貪欲法＋再配置）",
+        "engine_colgen": "列生成法（パターンベース）",
+        "engine_multistart": "マルチスタート（乱択貪欲法を並列実行）",
+        "engine_lns": "大近傍探索（ロールの一部を繰り返し再最適化）",
+        "formulation": "数理モデルの定式化",
+        "formulation_compact": "コンパクト（整数カット数）",
+        "formulation_onehot": "0/1展開（従来）",
+        "backend": "ソルバー",
+        "threads": "スレッド数",
+        "warm_start": "貪欲法の結果を初期解（ヒント）として使用する",
+        "time_limit": "計算時間の上限（秒）",
+        "relative_gap": "許容ギャップ（%）: 最適値との差がこれ以内と証明できたら早めに終了",
+        "solver_report": "ソルバー: {backend}（{threads}スレッド） / 状態: {status} / 実行時間: {wall_time:.2f}秒 / 目的関数値: {objective} / ギャップ: {gap}（許容 {gap_limit}）",
+        "cache_hit": "同じ入力の計算結果を再利用しました",
+        "stale": "入力が前回の最適化から変更されています。最適化実行を押すと再計算します。",
+        "elapsed": "計算時間: {elapsed:.2f}秒",
+        "lower_bound": "必要ロール本数の下限: {bound}本 / 計画: {used}本",
+        "conflict_lower": "幅 {width:.1f}mm（{lines}行目）: 再配置では必要長さ {limit:g}M に {amount:g}M 届きません",
+        "conflict_upper": "幅 {width:.1f}mm（{lines}行目）: 過剰生産の上限 {limit:g}M を {amount:g}M 超えないと割り付けられません",
+        "deficit": "幅 {width:.1f}mm（{line}行目）: 必要 {length:g}M のうち最大でも {possible:g}M しか作れません（不足 {deficit:g}M）",
+        "area_shortfall": "ロールの面積が合計で {area:.1f} mm×M 不足しています",
+        "running": "最適化を実行中… 経過 {elapsed:.1f}秒 / 現在の最良目的関数値: {objective}",
+        "queued": "順番待ち {position}番目… 他の最適化がスレッドを使用中です（使用中 {in_use}/{capacity}）",
+        "cancel": "キャンセル",
+        "incumbent": "暫定解（{elapsed:.1f}秒時点 / 目的関数値: {objective} / 最後のロールの端材: {remnant}）。キャンセルするとこの計画を結果にします",
+        "cancelling": "キャンセル中…（ソルバーの停止を待っています）",
+        "cache_stats": "キャッシュ: ヒット {hits}（ディスク {disk_hits}） / ミス {misses} / ヒット率 {hit_rate:.0%} / 保持 {size}/{maxsize}件"
     },
     "Tiếng Việt": {
         "title": "Công cụ tối ưu hóa chung",
@@ -40,311 +82,172 @@ TEXT = {
         "edge_loss": "Hao hụt đầu/cuối (mm)",
         "blade_width": "Độ dày dao cắt (mm)",
         "demand_input": "Nhập yêu cầu cắt",
-        "demand_count": "Số yêu cầu cắt",
         "cut_width": "Chiều rộng cắt",
         "cut_length": "Chiều dài cần thiết (M)",
         "stock_input": "Nhập tồn kho vật liệu",
-        "stock_count": "Số cuộn vật liệu",
         "roll_width": "Chiều rộng cuộn (mm)",
         "roll_length": "Chiều dài cuộn (M)",
         "roll_quantity": "Số lượng cuộn",
+        "upload": "Nhập từ CSV / Excel",
+        "upload_error": "Không đọc được tệp",
+        "invalid_rows": "Đã bỏ qua các dòng không phải số hoặc nhỏ hơn hay bằng 0 (dòng: {rows})",
         "exec": "Tối ưu hóa",
         "result": "Kết quả",
         "feedback": "Phản hồi cho yêu cầu cắt",
         "no_leftover": "Không có vật liệu thừa - tối ưu hóa hoàn toàn",
         "leftover_msg": "Có vật liệu thừa như sau:",
         "download": "Tải kết quả CSV",
-        "use_advanced": "Sử dụng thuật toán bố trí nâng cao"
+        "profile": "Đo toàn bộ lần chạy bằng cProfile và bộ nhớ cấp phát theo từng giai đoạn bằng tracemalloc (chậm hơn)",
+        "performance": "Hiệu năng",
+        "render_time": "Tạo bảng: {wall_time:.3f} giây",
+        "download_timings": "Tải kết quả đo JSON",
+        "use_advanced": "Sử dụng thuật toán bố trí nâng cao",
+        "engine": "Công cụ tối ưu hóa",
+        "engine_standard": "Tiêu chuẩn (tham lam + bố trí lại)",
+        "engine_colgen": "Sinh cột (dựa trên mẫu cắt)",
+        "engine_multistart": "Đa khởi đầu (chạy song song thuật toán tham lam ngẫu nhiên)",
+        "engine_lns": "Tìm kiếm lân cận lớn (tối ưu lại từng nhóm cuộn)",
+        "formulation": "Cách lập mô hình",
+        "formulation_compact": "Gọn (số lần cắt nguyên)",
+        "formulation_onehot": "Nhị phân 0/1 (truyền thống)",
+        "backend": "Bộ giải",
+        "threads": "Số luồng",
+        "warm_start": "Dùng kết quả thuật toán tham lam làm lời giải khởi đầu (gợi ý)",
+        "time_limit": "Giới hạn thời gian tính (giây)",
+        "relative_gap": "Khoảng cách cho phép (%): dừng sớm khi chứng minh được sai khác với tối ưu nằm trong mức này",
+        "solver_report": "Bộ giải: {backend} ({threads} luồng) / Trạng thái: {status} / Thời gian: {wall_time:.2f} giây / Giá trị mục tiêu: {objective} / Khoảng cách: {gap} (cho phép {gap_limit})",
+        "cache_hit": "Đã dùng lại kết quả tính toán với cùng dữ liệu đầu vào",
+        "stale": "Dữ liệu đầu vào đã thay đổi kể từ lần tối ưu hóa trước. Nhấn Tối ưu hóa để tính lại.",
+        "elapsed": "Thời gian tính: {elapsed:.2f} giây",
+        "lower_bound": "Số cuộn cần tối thiểu: {bound} cuộn / Kế hoạch: {used} cuộn",
+        "conflict_lower": "Chiều rộng {width:.1f}mm (dòng {lines}): khi bố trí lại còn thiếu {amount:g}M so với chiều dài cần {limit:g}M",
+        "conflict_upper": "Chiều rộng {width:.1f}mm (dòng {lines}): phải vượt giới hạn sản xuất dư {limit:g}M thêm {amount:g}M mới bố trí được",
+        "deficit": "Chiều rộng {width:.1f}mm (dòng {line}): cần {length:g}M nhưng tối đa chỉ làm được {possible:g}M (thiếu {deficit:g}M)",
+        "area_shortfall": "Tổng diện tích cuộn còn thiếu {area:.1f} mm×M",
+        "running": "Đang tối ưu hóa… Đã chạy {elapsed:.1f} giây / Giá trị mục tiêu tốt nhất hiện tại: {objective}",
+        "queued": "Đang chờ, vị trí thứ {position}… Các tối ưu hóa khác đang dùng luồng (đang dùng {in_use}/{capacity})",
+        "cancel": "Hủy",
+        "incumbent": "Lời giải tạm thời (tại {elapsed:.1f} giây / Giá trị mục tiêu: {objective} / Phần thừa của cuộn cuối: {remnant}). Nhấn Hủy để dùng phương án này làm kết quả",
+        "cancelling": "Đang hủy… (đang chờ bộ giải dừng)",
+        "cache_stats": "Bộ nhớ đệm: trúng {hits} (đĩa {disk_hits}) / trượt {misses} / tỷ lệ trúng {hit_rate:.0%} / lưu {size}/{maxsize}"
     }
 }
 
 T = TEXT[lang]
 FEEDBACK_HEADER = {"日本語": "フィードバック", "Tiếng Việt": "Phản hồi"}
 TABLE_HEADERS = {
-    "日本語": ["幅", "巻長", "カット数", "割付", "残り幅", "使用量", "残量", "フィードバック"],
-    "Tiếng Việt": ["Chiều rộng", "Chiều dài cuộn", "Số lần cắt", "Bố trí", "Phần dư", "Số lượng sử dụng", "Còn lại", "Phản hồi"]
+    "日本語": ["幅", "巻長", "本数", "カット数", "割付", "残り幅", "使用量", "残量", "フィードバック"],
+    "Tiếng Việt": ["Chiều rộng", "Chiều dài cuộn", "Số cuộn", "Số lần cắt", "Bố trí", "Phần dư", "Số lượng sử dụng", "Còn lại", "Phản hồi"]
 }
 
 st.title(T["title"])
-use_advanced = st.checkbox(T["use_advanced"])
+engine = st.selectbox(T["engine"], ENGINES, format_func=lambda e: T[f"engine_{e}"], key="engine")
+use_advanced = st.checkbox(T["use_advanced"], disabled=(engine != "standard"), key="use_advanced")
+uses_mip = (engine == "standard" and use_advanced) or engine == "lns"
+formulation = st.radio(T["formulation"], FORMULATIONS, format_func=lambda f: T[f"formulation_{f}"], horizontal=True, disabled=not uses_mip, key="formulation")
+c1, c2 = st.columns(2)
+backend = c1.selectbox(T["backend"], BACKENDS, disabled=not uses_mip, key="backend")
+# 既定はコアの一部（同時に使う他の画面のため）。SCIP・CBCは常に1スレッドで解く
+threads = c2.number_input(T["threads"], min_value=1, max_value=default_threads(), value=solver_threads(), step=1, disabled=not uses_mip or backend in SINGLE_THREADED, key="threads")
+warm_start = st.checkbox(T["warm_start"], value=True, disabled=not uses_mip, key="warm_start")
+c1, c2 = st.columns(2)
+time_limit = c1.number_input(T["time_limit"], min_value=1.0, max_value=600.0, value=DEFAULT_TIME_LIMIT, step=5.0, disabled=(engine == "standard" and not use_advanced), key="time_limit")
+relative_gap = c2.number_input(T["relative_gap"], min_value=0.0, max_value=50.0, value=DEFAULT_RELATIVE_GAP * 100, step=0.5, disabled=not uses_mip, key="relative_gap") / 100
+profile = st.checkbox(T["profile"], value=False, key="profile")
 
 st.header(T["param"])
-material_width = st.number_input(T["material_width"], value=1000.0, step=0.1, format="%.1f")
-edge_loss = st.number_input(T["edge_loss"], value=10.0, step=0.1, format="%.1f")
-blade_width = st.number_input(T["blade_width"], value=0.0, step=0.1, format="%.1f")
+material_width = st.number_input(T["material_width"], value=1000.0, step=0.1, format="%.1f", key="material_width")
+edge_loss = st.number_input(T["edge_loss"], value=10.0, step=0.1, format="%.1f", key="edge_loss")
+blade_width = st.number_input(T["blade_width"], value=0.0, step=0.1, format="%.1f", key="blade_width")
+
+def table_input(kind, columns, default, column_config):
+    # 表で入力（行の追加・削除可）。CSV/Excelをアップロードすると表の内容を置き換える
+    if f"{kind}_table" not in st.session_state:
+        st.session_state[f"{kind}_table"] = default
+        st.session_state[f"{kind}_version"] = 0
+    uploaded = st.file_uploader(T["upload"], type=["csv", "xlsx"], key=f"{kind}_upload")
+    if uploaded is not None and st.session_state.get(f"{kind}_file") != uploaded.file_id:
+        st.session_state[f"{kind}_file"] = uploaded.file_id
+        try:
+            st.session_state[f"{kind}_table"] = read_table(uploaded, uploaded.name, columns)
+            st.session_state[f"{kind}_version"] += 1
+        except ValueError as e:
+            st.error(f"{T['upload_error']}: {e}")
+    table = st.data_editor(st.session_state[f"{kind}_table"], num_rows="dynamic", use_container_width=True,
+                           column_config=column_config, key=f"{kind}_editor_{st.session_state[f'{kind}_version']}")
+    return table
 
 st.header(T["demand_input"])
-demand_count = st.number_input(T["demand_count"], min_value=1, value=3, step=1)
-demands = []
-for i in range(demand_count):
-    c1, c2 = st.columns(2)
-    width = c1.number_input(f"{T['cut_width']} {i+1} (mm)", value=100.0, step=0.1, format="%.1f")
-    length = c2.number_input(f"{T['cut_length']} {i+1}", value=1000)
-    demands.append({"width": width, "length": length})
+demand_table = table_input("demand", DEMAND_COLUMNS, pd.DataFrame({"width": [100.0] * 3, "length": [1000.0] * 3}), {
+    "width": st.column_config.NumberColumn(f"{T['cut_width']} (mm)", min_value=0.0, step=0.1, format="%.1f"),
+    "length": st.column_config.NumberColumn(T["cut_length"], min_value=0.0),
+})
+demands, invalid_demands = demand_records(demand_table)
+if invalid_demands:
+    st.warning(T["invalid_rows"].format(rows=", ".join(map(str, invalid_demands[:20]))))
 
 st.header(T["stock_input"])
-stock_count = st.number_input(T["stock_count"], min_value=1, value=3, step=1)
-stock = []
-for i in range(stock_count):
-    c1, c2, c3 = st.columns(3)
-    w = c1.number_input(f"{T['roll_width']} {i+1}", value=1000.0, step=0.1, format="%.1f")
-    l = c2.number_input(f"{T['roll_length']} {i+1}", value=50)
-    q = c3.number_input(f"{T['roll_quantity']} {i+1}", value=1)
-    for _ in range(q):
-        stock.append({"width": w, "length": l, "used": False})
-
-def assign_rolls(demands, stock, edge_loss, blade_width):
-    demand_needs = copy.deepcopy(demands)
-    sorted_stock = sorted(stock, key=lambda x: (x["width"], x["length"]))
-    results = []
-    can_cut_any = False
-    for d in demand_needs:
-        for s in sorted_stock:
-            if s["width"] - edge_loss >= d["width"] + blade_width:
-                can_cut_any = True
-                break
-        if can_cut_any:
-            break
-    if not can_cut_any:
-        st.error("エラー：いずれの材料ストックも作業指示の幅を満たしていません。物理的にカット不可能です。" if lang == "日本語" else "Lỗi: Không có cuộn vật liệu nào đủ rộng cho yêu cầu cắt.")
-        return []
-    for roll in sorted_stock:
-        remain_w = roll["width"] - edge_loss
-        layout = []
-        for d in sorted(demand_needs, key=lambda x: x["width"], reverse=True):
-            w = d["width"]
-            needed_cuts = ceil(d["length"] / roll["length"])
-            cuts = 0
-            while d["length"] > 0 and remain_w >= w + blade_width and cuts < needed_cuts:
-                layout.append(w)
-                remain_w -= (w + blade_width)
-                d["length"] -= roll["length"]
-                cuts += 1
-        results.append({
-            "width": roll["width"],
-            "length": roll["length"],
-            "cuts": len(layout),
-            "layout": layout,
-            "remain": remain_w
-        })
-    return results
+stock_table = table_input("stock", STOCK_COLUMNS, pd.DataFrame({"width": [1000.0] * 3, "length": [50.0] * 3, "count": [1] * 3}), {
+    "width": st.column_config.NumberColumn(T["roll_width"], min_value=0.0, step=0.1, format="%.1f"),
+    "length": st.column_config.NumberColumn(T["roll_length"], min_value=0.0),
+    "count": st.column_config.NumberColumn(T["roll_quantity"], min_value=0, step=1),
+})
+stock, invalid_stock = stock_records(stock_table)
+if invalid_stock:
+    st.warning(T["invalid_rows"].format(rows=", ".join(map(str, invalid_stock[:20]))))
 
-try:
-    from ortools.linear_solver import pywraplp
-    ORTOOLS_AVAILABLE = True
-except ImportError:
-    ORTOOLS_AVAILABLE = False
+if not ORTOOLS_AVAILABLE:
     st.warning("OR-Toolsがインストールされていません。高度な最適化機能は使用できません。" if lang == "日本語" else "OR-Tools chưa được cài đặt. Không thể sử dụng tính năng tối ưu hóa nâng cao.")
 
-def optimize_last_roll(results, edge_loss, blade_width, demands):
-    if not ORTOOLS_AVAILABLE:
-        return results
-    if len(results) < 2:
-        return results
-    try:
-        used_indices = [idx for idx, r in enumerate(results) if r["layout"]]
-        if len(used_indices) < 2:
-            return results
-        target_index = -1
-        max_score = -1
-        for idx in used_indices:
-            r = results[idx]
-            score = r["width"] * 1000 + r["length"]
-            if score > max_score:
-                max_score = score
-                target_index = idx
-        if target_index == -1:
-            return results
-        optimization_rolls = []
-        for idx in used_indices:
-            r = results[idx]
-            optimization_rolls.append({
-                "width": r["width"],
-                "length": r["length"],
-                "original_idx": idx,
-                "is_target": (idx == target_index)
-            })
-        num_rolls = len(optimization_rolls)
-        num_demands = len(demands)
-        solver = pywraplp.Solver.CreateSolver("SCIP")
-        if not solver:
-            st.warning("ソルバーの初期化に失敗しました。通常の最適化結果を使用します。" if lang == "日本語" else "Không thể khởi tạo bộ giải. Sử dụng kết quả tối ưu hóa thông thường.")
-            return results
+MESSAGES = {
+    "日本語": {
+        NO_FIT: ("error", "エラー：いずれの材料ストックも作業指示の幅を満たしていません。物理的にカット不可能です。"),
+        SOLVER_ERROR: ("error", "最適化中にエラーが発生しました: {error}"),
+        SOLVER_UNAVAILABLE: ("warning", "ソルバーの初期化に失敗しました。通常の最適化結果を使用します。"),
+        SOLVER_FAILED: ("warning", "最適化に失敗しました。通常の結果を使用します。"),
+        SOLVER_CANCELLED: ("warning", "最適化をキャンセルしました。その時点の最良解を表示しています。"),
+        QUEUE_CANCELLED: ("warning", "順番待ちの間にキャンセルしました。最適化は実行していません。"),
+        SOLVER_SKIPPED: ("warning", "在庫不足が確定しているため、高度な最適化を省略しました。"),
+        SHORTAGE: ("error", "作業指示に対して材料ストックが不足しています"),
+    },
+    "Tiếng Việt": {
+        NO_FIT: ("error", "Lỗi: Không có cuộn vật liệu nào đủ rộng cho yêu cầu cắt."),
+        SOLVER_ERROR: ("error", "Lỗi trong quá trình tối ưu hóa: {error}"),
+        SOLVER_UNAVAILABLE: ("warning", "Không thể khởi tạo bộ giải. Sử dụng kết quả tối ưu hóa thông thường."),
+        SOLVER_FAILED: ("warning", "Tối ưu hóa thất bại. Sử dụng kết quả thông thường."),
+        SOLVER_CANCELLED: ("warning", "Đã hủy tối ưu hóa. Đang hiển thị lời giải tốt nhất tại thời điểm đó."),
+        QUEUE_CANCELLED: ("warning", "Đã hủy trong khi đang chờ. Chưa chạy tối ưu hóa."),
+        SOLVER_SKIPPED: ("warning", "Chắc chắn thiếu vật liệu nên đã bỏ qua tối ưu hóa nâng cao."),
+        SHORTAGE: ("error", "Tồn kho vật liệu không đủ cho yêu cầu cắt"),
+    }
+}
 
-        import math
-        x = {}
-        demand_min_cuts = []
-        for i in range(num_demands):
-            min_cuts = []
-            for j in range(num_rolls):
-                cuts = math.ceil(demands[i]["length"] / optimization_rolls[j]["length"])
-                min_cuts.append(cuts)
-            demand_min_cuts.append(min_cuts)
-        for i in range(num_demands):
-            for j in range(num_rolls):
-                max_k = demand_min_cuts[i][j]
-                for k in range(0, max_k+1):
-                    x[i, j, k] = solver.IntVar(0, 1, f"x_{i}_{j}_{k}")
-        for i in range(num_demands):
-            for j in range(num_rolls):
-                solver.Add(solver.Sum([x[i, j, k] for k in range(0, demand_min_cuts[i][j]+1)]) <= 1)
-        for j in range(num_rolls):
-            width_sum_expr = []
-            for i in range(num_demands):
-                for k in range(1, demand_min_cuts[i][j]+1):
-                    width_sum_expr.append(x[i, j, k] * k * (demands[i]["width"] + blade_width))
-            if width_sum_expr:
-                total_width = solver.Sum(width_sum_expr)
-                solver.Add(total_width <= optimization_rolls[j]["width"] - edge_loss + blade_width)
-        for i in range(num_demands):
-            length_sum_expr = []
-            for j in range(num_rolls):
-                for k in range(1, demand_min_cuts[i][j]+1):
-                    length_sum_expr.append(x[i, j, k] * k * optimization_rolls[j]["length"])
-            if length_sum_expr:
-                total_production = solver.Sum(length_sum_expr)
-                solver.Add(total_production >= demands[i]["length"])
-                min_excess = []
-                for j in range(num_rolls):
-                    cut_needed = math.ceil(demands[i]["length"] / optimization_rolls[j]["length"])
-                    min_excess.append(cut_needed * optimization_rolls[j]["length"])
-                solver.Add(total_production <= min(min_excess))
-        y = {}
-        for i in range(num_demands):
-            for j in range(num_rolls):
-                y[i, j] = solver.IntVar(0, 1, f"y_{i}_{j}")
-                used = solver.Sum([x[i, j, k] for k in range(1, demand_min_cuts[i][j]+1)])
-                solver.Add(y[i, j] <= used)
-                solver.Add(y[i, j] * 50 >= used)
-        width_types_per_roll = []
-        for j in range(num_rolls):
-            types_in_roll = [y[i, j] for i in range(num_demands)]
-            if types_in_roll:
-                width_types_per_roll.append(solver.Sum(types_in_roll))
-        target_j = -1
-        for j in range(num_rolls):
-            if optimization_rolls[j]["is_target"]:
-                target_j = j
-                break
-        if target_j == -1:
-            return results
-        target_width_expr = []
-        for i in range(num_demands):
-            for k in range(1, demand_min_cuts[i][target_j]+1):
-                target_width_expr.append(x[i, target_j, k] * k * (demands[i]["width"] + blade_width))
-        if target_width_expr:
-            target_used_width = solver.Sum(target_width_expr)
-            target_remain = optimization_rolls[target_j]["width"] - edge_loss - target_used_width + blade_width
-        else:
-            target_remain = optimization_rolls[target_j]["width"] - edge_loss
-        other_remains = []
-        for j in range(num_rolls):
-            if j == target_j:
-                continue
-            width_expr = []
-            for i in range(num_demands):
-                for k in range(1, demand_min_cuts[i][j]+1):
-                    width_expr.append(x[i, j, k] * k * (demands[i]["width"] + blade_width))
-            if width_expr:
-                used_width_j = solver.Sum(width_expr)
-                remain_j = optimization_rolls[j]["width"] - edge_loss - used_width_j + blade_width
-            else:
-                remain_j = optimization_rolls[j]["width"] - edge_loss
-            other_remains.append(remain_j)
-        objective_expr = []
-        objective_expr.append(target_remain * 1000)
-        if other_remains:
-            objective_expr.append(-solver.Sum(other_remains) * 100)
-        if width_types_per_roll:
-            objective_expr.append(-solver.Sum(width_types_per_roll) * 10)
-        if objective_expr:
-            solver.Maximize(solver.Sum(objective_expr))
-        solver.SetTimeLimit(30000)
-        status = solver.Solve()
-        if status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE:
-            new_results = []
-            for r in results:
-                new_results.append({
-                    "width": r["width"],
-                    "length": r["length"],
-                    "cuts": 0,
-                    "layout": [],
-                    "remain": r["width"] - edge_loss
-                })
-            for j in range(num_rolls):
-                original_idx = optimization_rolls[j]["original_idx"]
-                layout = []
-                for i in range(num_demands):
-                    for k in range(1, demand_min_cuts[i][j]+1):
-                        if x[i, j, k].solution_value() > 0.5:
-                            for _ in range(k):
-                                layout.append(demands[i]["width"])
-                if layout:
-                    layout.sort()
-                    used = sum(layout) + blade_width * len(layout) - blade_width if layout else 0
-                    remain = optimization_rolls[j]["width"] - edge_loss - used
-                    new_results[original_idx] = {
-                        "width": optimization_rolls[j]["width"],
-                        "length": optimization_rolls[j]["length"],
-                        "cuts": len(layout),
-                        "layout": layout,
-                        "remain": remain
-                    }
-            return new_results
-        else:
-            st.warning("最適化に失敗しました。通常の結果を使用します。" if lang == "日本語" else "Tối ưu hóa thất bại. Sử dụng kết quả thông thường.")
-            return results
-    except Exception as e:
-        st.error(f"最適化中にエラーが発生しました: {str(e)}" if lang == "日本語" else f"Lỗi trong quá trình tối ưu hóa: {str(e)}")
-        return results
+POLL_INTERVAL = 0.5
 
-if st.button(T["exec"]):
-    base_result = assign_rolls(copy.deepcopy(demands), copy.deepcopy(stock), edge_loss, blade_width)
-    optimized_result = optimize_last_roll(base_result, edge_loss, blade_width, demands) if use_advanced else base_result
-    if use_advanced and len(optimized_result) > 1:
-        target_index = -1
-        max_score = -1
-        for idx, r in enumerate(optimized_result):
-            score = r["width"] * 1000 + r["length"]
-            if score > max_score:
-                max_score = score
-                target_index = idx
-        if target_index != -1 and target_index != len(optimized_result) - 1:
-            result = []
-            for idx, r in enumerate(optimized_result):
-                if idx != target_index:
-                    result.append(r)
-            result.append(optimized_result[target_index])
-        else:
-            result = optimized_result
-    else:
-        result = optimized_result
+@st.cache_resource
+def get_solve_cache():
+    # セッション間で共有。CUTTING_STOCK_CACHE にSQLiteファイルを指定すると再起動後も残る
+    return SolveCache(path=os.environ.get("CUTTING_STOCK_CACHE") or None)
 
-    # 材料ストック不足時アラーム（シンプル一行）
-    demand_actual = [0] * len(demands)
-    for r in result:
-        for w in r["layout"]:
-            for i, d in enumerate(demands):
-                if w == d["width"]:
-                    demand_actual[i] += r["length"]
-    if any(done < d["length"] for done, d in zip(demand_actual, demands)):
-        msg = "作業指示に対して材料ストックが不足しています" if lang == "日本語" else "Tồn kho vật liệu không đủ cho yêu cầu cắt"
-        st.error(msg)
+def job_running():
+    job = st.session_state.get("job")
+    return job is not None and not job.done
 
-    st.header(T["result"])
-    df = pd.DataFrame(result)
+def result_table(rolls, lang, material_width):
+    # 保存済みの結果から表示用の表を作る（言語や材料幅を変えても再計算しない）
+    df = pd.DataFrame(rolls)
     df.index += 1
     df.index.name = "ロール#" if lang == "日本語" else "Cuộn#"
 
     feedback_col = []
     usage_col = []
     remaining_col = []
-    for r in result:
+    for r in rolls:
         total_cut_width = sum(r["layout"])
         if material_width > 0:
-            usage = (total_cut_width / material_width) * r["length"]
+            usage = (total_cut_width / material_width) * r["length"] * r["count"]
             usage_col.append(f"{usage:.1f}")
-            remaining = (r["width"] / material_width) * r["length"] - usage
+            remaining = (r["width"] / material_width) * r["length"] * r["count"] - usage
             remaining_col.append(f"{remaining:.1f}")
         else:
             usage_col.append("0.0")
@@ -359,6 +262,113 @@ if st.button(T["exec"]):
     df["残量" if lang == "日本語" else "Còn lại"] = remaining_col
     df[FEEDBACK_HEADER[lang]] = feedback_col
     df.columns = TABLE_HEADERS[lang]
+    return df
+
+# 最後の解は入力キーと一緒に保存し、入力が変わったときだけ解き直す
+key = solve_key(demands, stock, edge_loss, blade_width, engine, use_advanced, formulation, backend, warm_start,
+                relative_gap=relative_gap, time_limit=time_limit)
+last_solve = st.session_state.get("last_solve")
+if st.button(T["exec"], disabled=job_running()):
+    # 計測を指定したときは同じ入力でも実行し直す
+    if last_solve is None or last_solve["key"] != key or not last_solve["reusable"] or profile:
+        st.session_state["job"] = SolveJob(demands, stock, edge_loss, blade_width, engine, use_advanced, formulation,
+                                           backend, threads, warm_start, time_limit, cache=get_solve_cache(),
+                                           relative_gap=relative_gap, profile=profile)
+        st.session_state["job_key"] = key
+
+# 実行中はスクリプトを止めずにポーリングする（ウィジェット操作で再実行されてもジョブは残る）
+job = st.session_state.get("job")
+if job_running():
+    position = job.queue_position
+    if position:
+        st.info(T["queued"].format(position=position, **job.admission.stats()))
+    else:
+        st.info(T["running"].format(
+            elapsed=job.elapsed,
+            objective="-" if job.best_objective is None else f"{job.best_objective:.1f}"
+        ))
+    if job.cancelled:
+        st.caption(T["cancelling"])
+    elif st.button(T["cancel"]):
+        job.cancel()
+    # ソルバーが改善解を見つけるたびに表を更新する
+    plan = job.latest_plan
+    if plan is not None:
+        st.caption(T["incumbent"].format(
+            elapsed=plan["elapsed"],
+            objective="-" if plan["objective"] is None else f"{plan['objective']:.1f}",
+            remnant="-" if plan["remnant"] is None else f"{plan['remnant']:.1f}mm"
+        ))
+        st.dataframe(result_table(plan["rolls"], lang, material_width), use_container_width=True)
+    time.sleep(POLL_INTERVAL)
+    st.rerun()
 
+if job is not None:
+    last_solve = {
+        "key": st.session_state.pop("job_key"),
+        "result": job.result,
+        "error": job.error,
+        "elapsed": job.elapsed,
+        "reusable": job.result is not None and is_reusable(job.result),
+    }
+    st.session_state["last_solve"] = last_solve
+    del st.session_state["job"]
+
+if last_solve is not None and last_solve["error"]:
+    st.error(f"最適化中にエラーが発生しました: {last_solve['error']}" if lang == "日本語" else f"Lỗi trong quá trình tối ưu hóa: {last_solve['error']}")
+
+if last_solve is not None and last_solve["result"] is not None:
+    solve_cache = get_solve_cache()
+    solved = last_solve["result"]
+    result, solver_report = solved["rolls"], solved["report"]
+    for code in solved["messages"]:
+        if code in MESSAGES[lang]:
+            kind, msg = MESSAGES[lang][code]
+            getattr(st, kind)(msg.format(error=(solver_report or {}).get("error", "")))
+
+    st.header(T["result"])
+    if last_solve["key"] != key:
+        st.warning(T["stale"])
+    if solved["cache_hit"]:
+        st.info(T["cache_hit"])
+    st.caption(T["elapsed"].format(elapsed=last_solve["elapsed"]))
+    check = solved.get("preflight")
+    if check:
+        for d in check["deficits"]:
+            st.error(T["deficit"].format(width=d["width"], line=d["line"] + 1, length=d["length"],
+                                         possible=d["length"] - d["deficit"], deficit=d["deficit"]))
+        if check["area_shortfall"] > 0:
+            st.error(T["area_shortfall"].format(area=check["area_shortfall"]))
+        if check["rolls_lower_bound"] is not None:
+            st.caption(T["lower_bound"].format(bound=check["rolls_lower_bound"],
+                                               used=sum(r["count"] for r in result if r["layout"])))
+    st.caption(T["cache_stats"].format(**solve_cache.stats()))
+    if solver_report and solver_report.get("diagnosis"):
+        for c in solver_report["diagnosis"]["conflicts"]:
+            st.warning(T[f"conflict_{c['bound']}"].format(width=c["width"], lines=", ".join(map(str, c["lines"])),
+                                                          limit=c["limit"], amount=c["amount"]))
+    if solver_report:
+        st.caption(T["solver_report"].format(
+            backend=solver_report["backend"],
+            threads=solver_report["threads"],
+            status=solver_report["status"],
+            wall_time=solver_report["wall_time"],
+            objective="-" if solver_report["objective"] is None else f"{solver_report['objective']:.1f}",
+            gap="-" if solver_report["gap"] is None else f"{solver_report['gap'] * 100:.2f}%",
+            gap_limit="-" if solver_report.get("gap_limit") is None else f"{solver_report['gap_limit'] * 100:.2f}%"
+        ))
+    render = PhaseRecorder()
+    with render.phase("render_table"):
+        df = result_table(result, lang, material_width)
     st.dataframe(df, use_container_width=True)
     st.download_button(label=T["download"], data=df.to_csv(index=False, encoding="utf-8-sig"), file_name="cutting_result.csv", mime="text/csv")
+    with st.expander(T["performance"]):
+        timings = solved.get("timings") or []
+        if timings:
+            st.dataframe(pd.DataFrame(summarize(timings)), use_container_width=True)
+        st.caption(T["render_time"].format(wall_time=render.phases[0]["wall_time"]))
+        st.download_button(label=T["download_timings"], file_name="cutting_timings.json", mime="application/json",
+                           data=json.dumps({"timings": timings + render.phases, "profile": solved.get("profile")},
+                                           ensure_ascii=False, indent=2))
+        if solved.get("profile"):
+            st.code(solved["profile"])